@@ -1,81 +1,560 @@
-import os
-import aiofiles
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
-from fastapi.responses import JSONResponse
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from core.config import get_settings
-from dependencies import get_ml_service, get_current_user
+from dependencies import get_job_manager, get_ml_service, get_current_user, get_websocket_user
 from models.audio_record import AudioRecord
+from services.admission import OverloadedError
+from services.decoders import AudioFormatError
+from services.jobs import Job, JobManager
+from services.live_inference import LiveSession
 from services.ml_service import MLService
-from schemas.audio import PredictionResponse, HistoryResponse, RecordResponse
+from services.uploads import (
+    AudioUpload, InvalidUploadError, UploadTooLargeError, receive_audio_upload, receive_audio_uploads
+)
+from schemas.audio import (
+    PredictionResponse, BatchPredictionResponse, JobResponse, HistoryResponse, RecordResponse
+)
+
+logger = logging.getLogger("uvicorn.error")
 
 router = APIRouter()
 
-@router.post("/predict", response_model=PredictionResponse)
+# Documents the multipart body the route parses itself
+AUDIO_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"audio": {"type": "string", "format": "binary"}},
+                    "required": ["audio"]
+                }
+            }
+        }
+    }
+}
+
+# Same, with the audio field repeated once per file
+AUDIO_BATCH_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "audio": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                    },
+                    "required": ["audio"]
+                }
+            }
+        }
+    }
+}
+
+async def _predict_and_save(
+    ml_service: MLService,
+    upload: AudioUpload,
+    username: str,
+    settings,
+    shed: bool = True
+) -> Dict[str, Any]:
+    """Predict on an upload and save the outcome to the user's history"""
+    
+    # Process audio and get predictions
+    result = await ml_service.predict_audio(upload.file, settings, content_digest=upload.digest, shed=shed)
+    
+    await _save_record(username, result)
+    return result
+
+async def _save_record(username: str, result: Dict[str, Any]) -> None:
+    """Save a prediction summary to the user's history and add its record_id"""
+    
+    # Save results to database
+    overall_prediction = result['overall_prediction']
+    avg_probabilities = result['average_probabilities']
+    
+    record = await AudioRecord.create(
+        username=username,
+        overall_class=overall_prediction['predicted_class'],
+        confidence=overall_prediction['confidence'],
+        probabilities=avg_probabilities
+    )
+    
+    # Add record ID to result
+    if record:
+        result['record_id'] = str(record['_id'])
+
+def _format_event(event: Dict[str, Any], sse: bool) -> str:
+    """One prediction event as a server-sent event or an NDJSON line"""
+    data = json.dumps(event)
+    if sse:
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + "\n"
+
+async def _stream_events(
+    first: Dict[str, Any],
+    events: AsyncIterator[Dict[str, Any]],
+    username: str,
+    sse: bool
+) -> AsyncIterator[str]:
+    """Serialise MLService.predict_stream events, saving the record when the summary arrives"""
+    
+    try:
+        event = first
+        while event is not None:
+            if event['event'] == 'summary':
+                event['event'] = 'result'
+                await _save_record(username, event)
+            yield _format_event(event, sse)
+            event = await anext(events, None)
+    except Exception as e:
+        # The status line has already been sent, so failures become a final event
+        detail = f"Invalid audio file: {str(e)}" if isinstance(e, AudioFormatError) else str(e)
+        yield _format_event({'event': 'error', 'detail': detail}, sse)
+    finally:
+        await events.aclose()
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+def _format_job(job: Job) -> Dict[str, Any]:
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'submitted_at': _isoformat(job.submitted_at),
+        'started_at': _isoformat(job.started_at),
+        'finished_at': _isoformat(job.finished_at),
+        'result': job.result,
+        'error': job.error
+    }
+
+@router.post("/predict", response_model=PredictionResponse, openapi_extra=AUDIO_UPLOAD_BODY)
 async def predict_depression(
-    audio: UploadFile = File(...),
+    request: Request,
     current_user: str = Depends(get_current_user),
     ml_service: MLService = Depends(get_ml_service),
     settings = Depends(get_settings)
 ):
-    """Process an audio file and return depression predictions"""
+    """
+    Process an audio file and return depression predictions. The upload is
+    streamed: its type and size are validated while it arrives, so a rejected
+    file is never received in full.
+    """
+    
+    try:
+        # Shed load before receiving the body
+        ml_service.admission.check()
+        
+        # Stream the upload into a spool, hashing it on the way in; the spool is
+        # left for the GC since a shared (single-flight) computation may still read it
+        upload = await receive_audio_upload(
+            request.headers,
+            request.stream(),
+            field_name="audio",
+            max_size=settings.max_file_size,
+            allowed_extensions=settings.allowed_extensions,
+            spool_size=settings.upload_spool_size,
+            spool_dir=settings.upload_spool_dir
+        )
+        
+        result = await _predict_and_save(ml_service, upload, current_user, settings)
+        
+        return JSONResponse(content=result, status_code=200)
     
-    # Validate file type
-    if not audio.filename.lower().endswith(tuple(settings.allowed_extensions)):
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except InvalidUploadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OverloadedError as e:
+        # Shed load quickly so clients back off instead of timing out together
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except AudioFormatError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file type. Allowed: {settings.allowed_extensions}"
+            detail=f"Invalid audio file: {str(e)}"
         )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Audio processing failed: {str(e)}"
+        )
+
+@router.post("/predict/stream", openapi_extra=AUDIO_UPLOAD_BODY)
+async def predict_depression_stream(
+    request: Request,
+    current_user: str = Depends(get_current_user),
+    ml_service: MLService = Depends(get_ml_service),
+    settings = Depends(get_settings)
+):
+    """
+    Process an audio file and stream its predictions as each chunk of
+    segments is scored: NDJSON lines, or server-sent events when the client
+    accepts text/event-stream. Each "segments" event carries the chunk's
+    segment predictions and the running overall estimate; the final "result"
+    event carries the same summary and record_id as /predict.
+    """
     
-    # Validate file size
-    if audio.size and audio.size > settings.max_file_size:
+    try:
+        # Shed load before receiving the body
+        ml_service.admission.check()
+        
+        upload = await receive_audio_upload(
+            request.headers,
+            request.stream(),
+            field_name="audio",
+            max_size=settings.max_file_size,
+            allowed_extensions=settings.allowed_extensions,
+            spool_size=settings.upload_spool_size,
+            spool_dir=settings.upload_spool_dir
+        )
+        
+        # Wait for the first chunk before responding, so unreadable audio still gets a 400
+        events = ml_service.predict_stream(upload.file, settings, content_digest=upload.digest)
+        first = await anext(events)
+    
+    except UploadTooLargeError as e:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File too large. Max size: {settings.max_file_size} bytes"
+            detail=str(e)
+        )
+    except InvalidUploadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except AudioFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid audio file: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Audio processing failed: {str(e)}"
         )
     
-    # Create temp directory
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_path = os.path.join(temp_dir, f"temp_{current_user}_{audio.filename}")
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        _stream_events(first, events, current_user, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _finish_live_session(
+    ml_service: MLService,
+    session: LiveSession,
+    username: str,
+    settings,
+    score_rest: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Score what is left of a live stream and save it; returns the events still
+    to send. With score_rest=False (after a failure) only what was already
+    scored is saved.
+    """
+    
+    events = []
+    if score_rest:
+        windows, tail = session.finish(settings.segment_tail)
+        for segments in (windows, tail):
+            if segments is not None and len(segments):
+                entries = await ml_service.score_live(session, segments, settings)
+                events.append({'event': 'segments', 'segments': entries, 'estimate': session.accumulator.estimate()})
     
     try:
-        # Save uploaded file
-        async with aiofiles.open(temp_path, 'wb') as f:
-            content = await audio.read()
-            await f.write(content)
+        result = dict(session.accumulator.summary(), event='result')
+    except AudioFormatError as e:
+        return events + [{'event': 'error', 'detail': f"Invalid audio file: {str(e)}"}]
+    except Exception as e:
+        return events + [{'event': 'error', 'detail': f"Audio processing failed: {str(e)}"}]
+    
+    await _save_record(username, result)
+    return events + [result]
+
+@router.websocket("/ws/predict")
+async def predict_depression_live(
+    websocket: WebSocket,
+    sample_rate: Optional[int] = None,
+    encoding: str = "pcm_s16le",
+    current_user: Optional[str] = Depends(get_websocket_user),
+    ml_service: MLService = Depends(get_ml_service),
+    settings = Depends(get_settings)
+):
+    """
+    Live analysis of a microphone stream. Connect with ?token=<JWT> (or a
+    Bearer header), optionally &sample_rate= (default settings.sample_rate)
+    and &encoding=pcm_s16le|pcm_f32le, then send mono PCM as binary messages.
+    Each completed segment_length window is scored and answered with a
+    "segments" event carrying its predictions and the running estimate.
+    Sending the text message "end" (or reaching max_audio_duration, if set) closes
+    the stream with a final "result" event; the session is saved as one
+    record when it closes, also if the client just disconnects or scoring
+    fails part-way (then with the segments scored so far).
+    """
+    
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    try:
+        session = ml_service.open_live_session(settings, sample_rate or settings.sample_rate, encoding)
+    except OverloadedError:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    except ValueError:
+        await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+        return
+    
+    connected = True
+    finished = False
+    try:
+        await websocket.accept()
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                connected = False
+                break
+            
+            if message.get('bytes') is not None:
+                entries = await ml_service.score_live(session, session.push(message['bytes']), settings)
+                if entries:
+                    await websocket.send_json({
+                        'event': 'segments',
+                        'segments': entries,
+                        'estimate': session.accumulator.estimate()
+                    })
+                if settings.max_audio_duration is not None and session.duration >= settings.max_audio_duration:
+                    break
+            elif message.get('text', '').strip() == 'end':
+                break
+            else:
+                await websocket.send_json({'event': 'error', 'detail': "Expected binary PCM or 'end'"})
         
-        # Process audio and get predictions
-        result = await ml_service.predict_audio(temp_path, settings)
+        events = await _finish_live_session(ml_service, session, current_user, settings)
+        finished = True
+        if connected:
+            for event in events:
+                await websocket.send_json(event)
+            await websocket.close()
+    
+    except WebSocketDisconnect:
+        # Save what was received before the client went away
+        if not finished:
+            await _finish_live_session(ml_service, session, current_user, settings)
+    except Exception as e:
+        if not finished:
+            # Keep the audio scored before the failure
+            try:
+                await _finish_live_session(ml_service, session, current_user, settings, score_rest=False)
+            except Exception:
+                logger.error("Failed to save a live session after an error", exc_info=True)
+            if connected:
+                await websocket.send_json({'event': 'error', 'detail': f"Audio processing failed: {str(e)}"})
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        ml_service.close_live_session(session)
+
+@router.post("/predict/batch", response_model=BatchPredictionResponse, openapi_extra=AUDIO_BATCH_UPLOAD_BODY)
+async def predict_depression_batch(
+    request: Request,
+    current_user: str = Depends(get_current_user),
+    ml_service: MLService = Depends(get_ml_service),
+    settings = Depends(get_settings)
+):
+    """
+    Process several audio files in one request. All files are featurised in
+    parallel and scored in one shared forward pass, and their records are
+    saved with a single insert. A file that cannot be processed gets an error
+    entry without failing the rest of the batch.
+    """
+    
+    try:
+        # Shed load before receiving the body
+        ml_service.admission.check()
         
-        # Save results to database
-        overall_prediction = result['overall_prediction']
-        avg_probabilities = result['average_probabilities']
+        uploads = await receive_audio_uploads(
+            request.headers,
+            request.stream(),
+            field_name="audio",
+            max_size=settings.max_file_size,
+            max_files=settings.batch_max_files,
+            max_total_size=settings.batch_max_total_size,
+            allowed_extensions=settings.allowed_extensions,
+            spool_size=settings.upload_spool_size,
+            spool_dir=settings.upload_spool_dir
+        )
+        
+        # Process all files together
+        outcomes = await ml_service.predict_batch(
+            [upload.file for upload in uploads],
+            settings,
+            content_digests=[upload.digest for upload in uploads]
+        )
         
-        record = await AudioRecord.create(
-            username=current_user,
-            overall_class=overall_prediction['predicted_class'],
-            confidence=overall_prediction['confidence'],
-            probabilities=avg_probabilities
+        # Save all successful results to database at once
+        predictions = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+        records = await AudioRecord.create_many(
+            current_user,
+            [
+                {
+                    'overall_class': result['overall_prediction']['predicted_class'],
+                    'confidence': result['overall_prediction']['confidence'],
+                    'probabilities': result['average_probabilities']
+                }
+                for result in predictions
+            ]
         )
         
-        # Add record ID to result
-        if record:
+        # Add record IDs to results
+        for result, record in zip(predictions, records):
             result['record_id'] = str(record['_id'])
         
-        return JSONResponse(content=result, status_code=200)
+        results = []
+        for upload, outcome in zip(uploads, outcomes):
+            if isinstance(outcome, AudioFormatError):
+                results.append({'filename': upload.filename, 'prediction': None, 'error': f"Invalid audio file: {str(outcome)}"})
+            elif isinstance(outcome, Exception):
+                results.append({'filename': upload.filename, 'prediction': None, 'error': str(outcome)})
+            else:
+                results.append({'filename': upload.filename, 'prediction': outcome, 'error': None})
+        
+        return JSONResponse(
+            content={
+                'results': results,
+                'total_files': len(results),
+                'failed_files': len(results) - len(predictions)
+            },
+            status_code=200
+        )
     
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except InvalidUploadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Audio processing failed: {str(e)}"
         )
+
+@router.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=AUDIO_UPLOAD_BODY
+)
+async def submit_prediction_job(
+    request: Request,
+    current_user: str = Depends(get_current_user),
+    ml_service: MLService = Depends(get_ml_service),
+    job_manager: JobManager = Depends(get_job_manager),
+    settings = Depends(get_settings)
+):
+    """
+    Queue an audio file for analysis and return its job id without waiting
+    for the prediction. Poll /jobs/{job_id} for the result; completed jobs
+    are saved to the history exactly like /predict.
+    """
     
-    finally:
-        # Clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    try:
+        # Reject before receiving the body when the job queue is full
+        job_manager.check()
+        
+        upload = await receive_audio_upload(
+            request.headers,
+            request.stream(),
+            field_name="audio",
+            max_size=settings.max_file_size,
+            allowed_extensions=settings.allowed_extensions,
+            spool_size=settings.upload_spool_size,
+            spool_dir=settings.upload_spool_dir
+        )
+        
+        # Job workers bound concurrency themselves, so they wait for an
+        # admission slot rather than being shed
+        job = await job_manager.submit(
+            current_user,
+            lambda: _predict_and_save(ml_service, upload, current_user, settings, shed=False)
+        )
+    
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except InvalidUploadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    return JSONResponse(
+        content=_format_job(job),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": str(request.url_for("get_prediction_job", job_id=job.id))}
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_prediction_job(
+    job_id: str,
+    current_user: str = Depends(get_current_user),
+    job_manager: JobManager = Depends(get_job_manager)
+):
+    """Get the status of a prediction job and, once completed, its result"""
+    
+    job = job_manager.get(job_id, owner=current_user)
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return _format_job(job)
 
 @router.get("/history", response_model=List[HistoryResponse])
 async def get_audio_history(
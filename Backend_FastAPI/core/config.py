@@ -1 +1,171 @@
+import os
+from functools import lru_cache
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict
+from dotenv import load_dotenv
 
+# Settings read the environment when this module is imported
+load_dotenv()
+
+class Settings(BaseModel):
+    """Application settings loaded from environment variables"""
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    # Database
+    mongo_uri: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+
+    # JWT
+    jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "jwt-secret-key-change-in-production")
+    jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
+    jwt_expire_hours: int = int(os.getenv("JWT_EXPIRE_HOURS", "24"))
+
+    # Model
+    model_path: str = os.getenv("MODEL_PATH", "model/best_model.pth")
+    # "fp32" serves model_path; "int8" serves the quantized artifact written by
+    # scripts/quantize_model.py (CPU only)
+    model_precision: Literal["fp32", "int8"] = os.getenv("MODEL_PRECISION", "fp32")
+    quantized_model_path: str = os.getenv("QUANTIZED_MODEL_PATH", "model/best_model_int8.pt")
+
+    # Inference runtime: "torch" or "onnxruntime" (graph written by scripts/export_onnx.py);
+    # ONNX Runtime thread counts default to its own choice when 0
+    inference_backend: Literal["torch", "onnxruntime"] = os.getenv("INFERENCE_BACKEND", "torch")
+    onnx_model_path: str = os.getenv("ONNX_MODEL_PATH", "model/best_model.onnx")
+    ort_intra_op_threads: int = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+    ort_inter_op_threads: int = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+    class_labels: List[str] = ["Minimal", "Moderate", "Severe"]
+
+    # Fold BatchNorm into conv/linear weights and drop Dropout for inference
+    fuse_batchnorm: bool = os.getenv("FUSE_BATCHNORM", "true").lower() == "true"
+
+    # Inference mode: "eager", "torchscript" (trace + freeze) or "compile" (torch.compile).
+    # Compiled modes pad every batch up to the nearest bucket size so the graph is
+    # specialised only for these shapes, all of which are warmed up at startup
+    inference_mode: Literal["eager", "torchscript", "compile"] = os.getenv("INFERENCE_MODE", "eager")
+    batch_buckets: List[int] = [int(size) for size in os.getenv("BATCH_BUCKETS", "1,4,16,64").split(",")]
+
+    # Micro-batching: segments from concurrent requests share one forward pass of
+    # up to batch_max_size, waiting at most batch_max_wait_ms for the batch to fill
+    batching_enabled: bool = os.getenv("BATCHING_ENABLED", "true").lower() == "true"
+    batch_max_size: int = int(os.getenv("BATCH_MAX_SIZE", "64"))
+    batch_max_wait_ms: float = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+    # Prediction cache: results keyed by a hash of the upload, model version and
+    # preprocessing settings; duplicate in-flight uploads share one computation
+    prediction_cache_enabled: bool = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+    prediction_cache_size: int = int(os.getenv("PREDICTION_CACHE_SIZE", "256"))
+    prediction_cache_ttl: float = float(os.getenv("PREDICTION_CACHE_TTL", "600"))
+
+    # Pipeline stages: preprocessing threads and the bound on jobs queued or running
+    # in each stage (inference always runs on one dedicated thread)
+    preprocess_workers: int = int(os.getenv("PREPROCESS_WORKERS", "2"))
+    preprocess_queue_size: int = int(os.getenv("PREPROCESS_QUEUE_SIZE", "8"))
+    inference_queue_size: int = int(os.getenv("INFERENCE_QUEUE_SIZE", "16"))
+    # With preprocess_processes > 0, decoding and featurisation run in that many warm
+    # worker processes instead (features come back through shared memory), each
+    # limited to preprocess_threads_per_process BLAS/torch threads
+    preprocess_processes: int = int(os.getenv("PREPROCESS_PROCESSES", "0"))
+    preprocess_threads_per_process: int = int(os.getenv("PREPROCESS_THREADS_PER_PROCESS", "1"))
+
+    # Admission control: at most max_concurrent_predictions run at once and at most
+    # max_queued_predictions wait for a slot; a request whose estimated queue time
+    # exceeds queue_latency_budget seconds is rejected at once with 503 + Retry-After
+    max_concurrent_predictions: int = int(os.getenv("MAX_CONCURRENT_PREDICTIONS", "4"))
+    max_queued_predictions: int = int(os.getenv("MAX_QUEUED_PREDICTIONS", "16"))
+    queue_latency_budget: float = float(os.getenv("QUEUE_LATENCY_BUDGET", "10"))
+
+    # Background jobs (/api/jobs): job_workers jobs run at once, at most job_queue_size
+    # wait (further submissions get 503), and finished jobs can be polled for
+    # job_result_ttl seconds. "memory" is an in-process queue that needs no broker
+    job_queue: Literal["memory"] = os.getenv("JOB_QUEUE", "memory")
+    job_workers: int = int(os.getenv("JOB_WORKERS", "2"))
+    job_queue_size: int = int(os.getenv("JOB_QUEUE_SIZE", "64"))
+    job_result_ttl: float = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+    # Live streams (/api/ws/predict): open WebSocket sessions per process; each is
+    # also cut off after max_audio_duration seconds of audio when that is set
+    live_max_sessions: int = int(os.getenv("LIVE_MAX_SESSIONS", "256"))
+
+    # Chunked inference: segments are featurised and scored this many at a time,
+    # bounding feature and activation memory regardless of recording length
+    inference_chunk_size: int = int(os.getenv("INFERENCE_CHUNK_SIZE", "256"))
+
+    # Tensor arena: feature and batch buffers are preallocated per segment-count
+    # bucket (batch_buckets, batch_max_size and inference_chunk_size) and reused
+    # across requests, keeping at most arena_buffers_per_bucket idle per shape and
+    # arena_max_bytes idle in total, in the server and in each preprocessing process.
+    # A raw-segment batch alone is inference_chunk_size x segment samples x 4 bytes
+    # (16 MB at the defaults), so the byte cap is what bounds idle memory
+    arena_enabled: bool = os.getenv("ARENA_ENABLED", "true").lower() == "true"
+    arena_buffers_per_bucket: int = int(os.getenv("ARENA_BUFFERS_PER_BUCKET", "2"))
+    arena_max_bytes: int = int(os.getenv("ARENA_MAX_BYTES", str(32 * 1024 * 1024)))
+
+    # Uploads
+    allowed_extensions: List[str] = [".wav", ".mp3", ".ogg"]
+    max_file_size: int = int(os.getenv("MAX_FILE_SIZE", str(16 * 1024 * 1024)))
+    # Uploads are streamed into a buffer kept in memory up to this size and
+    # spilled to a temporary file beyond it
+    upload_spool_size: int = int(os.getenv("UPLOAD_SPOOL_SIZE", str(1024 * 1024)))
+    # Directory of spilled uploads; tmpfs by default so spilling costs no disk I/O.
+    # Queued jobs keep their spool until they run, so point this at disk if
+    # JOB_QUEUE_SIZE * MAX_FILE_SIZE is more than tmpfs can hold
+    upload_spool_dir: Optional[str] = os.getenv(
+        "UPLOAD_SPOOL_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None
+    )
+    # /api/predict/batch: files per request, each limited to max_file_size, and
+    # their combined size
+    batch_max_files: int = int(os.getenv("BATCH_MAX_FILES", "16"))
+    batch_max_total_size: int = int(os.getenv("BATCH_MAX_TOTAL_SIZE", str(64 * 1024 * 1024)))
+
+    # Decoding: directory used when a format cannot be decoded from memory
+    # (defaults to tmpfs when available)
+    decode_temp_dir: Optional[str] = os.getenv(
+        "DECODE_TEMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None
+    )
+    # Opt-in limit in seconds: uploads whose header declares a longer recording are
+    # rejected before decoding. Unset by default, so only max_file_size applies
+    max_audio_duration: Optional[float] = (
+        float(os.getenv("MAX_AUDIO_DURATION")) if os.getenv("MAX_AUDIO_DURATION") else None
+    )
+    # WAV files on disk at least this large are memory-mapped instead of read
+    wav_memmap_threshold: int = int(os.getenv("WAV_MEMMAP_THRESHOLD", str(8 * 1024 * 1024)))
+    # Concurrent ffmpeg decoders for files libsndfile cannot open (0 disables ffmpeg)
+    ffmpeg_processes: int = int(os.getenv("FFMPEG_PROCESSES", "2"))
+    # Resampler for audio not already at sample_rate: "soxr" (RESAMPLER_QUALITY "HQ"
+    # matches librosa.load; lower qualities are faster)
+    resampler: Literal["soxr"] = os.getenv("RESAMPLER", "soxr")
+    resampler_quality: Literal["VHQ", "HQ", "MQ", "LQ", "QQ"] = os.getenv("RESAMPLER_QUALITY", "HQ")
+
+    # Audio preprocessing
+    sample_rate: int = 16000
+    n_fft: int = 1024
+    hop_length: int = 256
+    win_length: int = 1024
+    # "segment" runs one STFT per segment; "shared" runs one STFT over the frames the
+    # segments cover and slices each segment's window out of it. Both give the same
+    # model input (within 1e-4); shared is cheaper for overlapping segments whose hop
+    # is a multiple of hop_length, and costs the same as segment mode otherwise
+    stft_mode: Literal["segment", "shared"] = os.getenv("STFT_MODE", "segment")
+    n_mels: int = 64
+    d_shape: int = 64
+
+    # Segmentation: window length and hop in seconds (hop < length overlaps windows),
+    # and what to do with the remainder after the last full window
+    segment_length: float = float(os.getenv("SEGMENT_LENGTH", "1.0"))
+    segment_hop: Optional[float] = float(os.getenv("SEGMENT_HOP")) if os.getenv("SEGMENT_HOP") else None
+    segment_tail: Literal["drop", "pad", "short"] = os.getenv("SEGMENT_TAIL", "drop")
+
+    # Voice-activity gating between segmentation and feature extraction: "off",
+    # "drop" (non-speech segments are never featurised or scored) or "flag" (scored
+    # and reported with speech=false, but left out of the overall prediction)
+    vad_mode: Literal["off", "drop", "flag"] = os.getenv("VAD_MODE", "off")
+    # Frames at or above this RMS level (dBFS) and at or below this zero-crossing
+    # rate count as speech; a segment needs vad_min_speech_fraction of such frames
+    vad_energy_threshold_db: float = float(os.getenv("VAD_ENERGY_THRESHOLD_DB", "-45"))
+    vad_max_zcr: float = float(os.getenv("VAD_MAX_ZCR", "0.35"))
+    vad_min_speech_fraction: float = float(os.getenv("VAD_MIN_SPEECH_FRACTION", "0.1"))
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Get cached application settings"""
+    return Settings()
@@ -1,7 +1,9 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from services.auth_service import AuthService
+from services.jobs import JobManager
 from services.ml_service import MLService
 import main
 
@@ -25,6 +27,21 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def get_websocket_user(websocket: WebSocket) -> Optional[str]:
+    """Get the user of a WebSocket from a `token` query parameter or Bearer header; None if invalid"""
+    
+    token = websocket.query_params.get("token")
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    if not token:
+        return None
+    
+    try:
+        return AuthService().get_current_user(token)
+    except Exception:
+        return None
+
 def get_ml_service() -> MLService:
     """Get the global ML service instance"""
     if main.ml_service is None:
@@ -32,4 +49,13 @@ def get_ml_service() -> MLService:
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="ML service not available"
         )
-    return main.ml_service
\ No newline at end of file
+    return main.ml_service
+
+def get_job_manager() -> JobManager:
+    """Get the global background job manager"""
+    if main.job_manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job service not available"
+        )
+    return main.job_manager
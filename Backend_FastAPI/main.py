@@ -1,3 +1,4 @@
+import asyncio
 import torch
 import logging
 from contextlib import asynccontextmanager
@@ -7,6 +8,7 @@ from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
 from core.config import get_settings
+from services.jobs import JobManager, create_job_queue
 from services.ml_service import MLService
 from api.routes import audio, auth, profile
 
@@ -19,27 +21,55 @@ load_dotenv()
 # Global ML service instance
 ml_service: MLService | None = None
 
+# Global background job manager
+job_manager: JobManager | None = None
+
+
+def _log_warmup_result(task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error("❌ Model warm-up failed", exc_info=task.exception())
+    else:
+        logger.info("✅ Model warm-up complete")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global ml_service
+    global ml_service, job_manager
 
     settings = get_settings()
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
     try:
-        ml_service = MLService(settings.model_path, device)
+        ml_service = MLService(settings.model_path, device, settings)
         await ml_service.load_model()
         logger.info(f"✅ Model loaded successfully on {device}")
     except Exception as e:
         logger.error("❌ Failed to load model", exc_info=True)
         raise
 
+    # Warm up in the background; /health reports ready once it completes
+    warmup_task = asyncio.create_task(ml_service.warmup())
+    warmup_task.add_done_callback(_log_warmup_result)
+
+    job_manager = JobManager(
+        create_job_queue(settings.job_queue, settings.job_queue_size),
+        workers=settings.job_workers,
+        result_ttl=settings.job_result_ttl
+    )
+    job_manager.start()
+
     yield
 
+    if not warmup_task.done():
+        warmup_task.cancel()
+
     # Shutdown
     logger.info("🔄 Shutting down...")
+    await job_manager.stop()
+    await ml_service.close()
 
 
 def create_app() -> FastAPI:
@@ -95,7 +125,42 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     global ml_service
-    return {
-        "status": "healthy",
-        "model_loaded": ml_service is not None and ml_service.model is not None,
-    }
+    model_loaded = ml_service is not None and ml_service.is_loaded()
+    warmup_complete = model_loaded and ml_service.warmed_up
+    warmup_error = ml_service.warmup_error if ml_service is not None else None
+    
+    # Current load, so the load balancer can route away from saturated replicas
+    admission = ml_service.admission if ml_service is not None else None
+    
+    # Not ready until the warmed-up fast path is available; a failed warm-up is
+    # reported as such so the instance can be restarted instead of waited on
+    if warmup_complete:
+        status = "healthy"
+    elif warmup_error is not None:
+        status = "failed"
+    else:
+        status = "warming_up"
+    return JSONResponse(
+        status_code=200 if warmup_complete else 503,
+        content={
+            "status": status,
+            "model_loaded": model_loaded,
+            "warmup_complete": warmup_complete,
+            "warmup_error": warmup_error,
+            "in_flight": admission.in_flight if admission else 0,
+            "queued": admission.queued if admission else 0,
+            "estimated_wait": admission.estimated_wait() if admission else 0.0,
+        },
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Inference pipeline and job queue metrics"""
+    global ml_service, job_manager
+    if ml_service is None:
+        return {"model_loaded": False}
+    metrics = ml_service.get_metrics()
+    if job_manager is not None:
+        metrics["jobs"] = job_manager.stats()
+    return metrics
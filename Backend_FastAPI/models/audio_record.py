@@ -34,6 +34,40 @@ class AudioRecord:
         record['_id'] = result.inserted_id
         return record
     
+    @staticmethod
+    async def create_many(username: str, predictions: List[Dict]) -> List[Dict]:
+        """Create several audio records with one insert; predictions hold overall_class, confidence and probabilities"""
+        
+        if not predictions:
+            return []
+        
+        db = await get_database()
+        
+        # Get user ID
+        user = await db.users.find_one({"username": username})
+        if not user:
+            return []
+        
+        # Create record documents
+        timestamp = datetime.utcnow()
+        records = [
+            {
+                "user_id": user['_id'],
+                "username": username,
+                "timestamp": timestamp,
+                "overall_class": prediction['overall_class'],
+                "confidence": prediction['confidence'],
+                "probabilities": prediction['probabilities']
+            }
+            for prediction in predictions
+        ]
+        
+        # Insert records into database
+        result = await db.audio_records.insert_many(records)
+        for record, inserted_id in zip(records, result.inserted_ids):
+            record['_id'] = inserted_id
+        return records
+    
     @staticmethod
     async def get_user_history(username: str, days: int = 30) -> List[Dict]:
         """Get audio analysis history for a user"""
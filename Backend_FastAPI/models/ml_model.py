@@ -2,6 +2,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from pathlib import Path
+from torch.nn.utils import fuse_conv_bn_eval
 
 # ----------------------
 # Model Architecture
@@ -54,12 +55,88 @@ class MyModel(nn.Module):
         return x, embed  # logits + embeddings
 
 
+# ----------------------
+# Fused Inference Model
+# ----------------------
+class FusedMyModel(nn.Module):
+    """
+    Inference-only MyModel: each BatchNorm2d is folded into the preceding conv,
+    bn_fc1 becomes a single multiply-add after fc1 (fc1's output is the
+    embedding, so it cannot be folded into fc1 itself) and Dropout is dropped.
+    Returns the same (logits, embeddings) as the eval-mode MyModel.
+    """
+    def __init__(self, model: MyModel):
+        super(FusedMyModel, self).__init__()
+        model = model.eval()
+        self.conv1 = fuse_conv_bn_eval(model.conv1, model.bn1)
+        self.conv2 = fuse_conv_bn_eval(model.conv2, model.bn2)
+        self.conv3 = fuse_conv_bn_eval(model.conv3, model.bn3)
+
+        self.fc1 = model.fc1
+        self.fc2 = model.fc2
+
+        # Eval-mode BatchNorm1d as y = x * scale + shift
+        bn = model.bn_fc1
+        scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+        self.register_buffer("fc1_scale", scale.detach().clone())
+        self.register_buffer("fc1_shift", (bn.bias - bn.running_mean * scale).detach().clone())
+
+    def forward(self, x):
+        x = F.max_pool2d(F.relu(self.conv1(x)), 2, 2)
+        x = F.max_pool2d(F.relu(self.conv2(x)), 2, 2)
+        x = F.max_pool2d(F.relu(self.conv3(x)), 2, 2)
+
+        x = torch.flatten(F.adaptive_avg_pool2d(x, 1), 1)
+
+        embed = self.fc1(x)
+        x = F.relu(torch.addcmul(self.fc1_shift, embed, self.fc1_scale))
+        x = self.fc2(x)
+        return x, embed  # logits + embeddings
+
+
+def fuse_model(model: MyModel) -> FusedMyModel:
+    """Fold BatchNorm layers into a trained model for inference"""
+    with torch.no_grad():
+        return FusedMyModel(model).eval()
+
+
+def verify_fused(
+    model: MyModel,
+    fused: nn.Module,
+    batch_size: int = 8,
+    atol: float = 1e-3,
+    rtol: float = 1e-4,
+    d_shape: int = 64
+) -> None:
+    """Assert the fused model reproduces the unfused logits and embeddings on a (batch_size, 1, d_shape, d_shape) input"""
+    device = next(model.parameters()).device
+    inputs = torch.rand(batch_size, 1, d_shape, d_shape, device=device)
+
+    with torch.no_grad():
+        logits, embed = model(inputs)
+        fused_logits, fused_embed = fused(inputs)
+
+    if not (torch.allclose(logits, fused_logits, atol=atol, rtol=rtol)
+            and torch.allclose(embed, fused_embed, atol=atol, rtol=rtol)):
+        max_diff = max((logits - fused_logits).abs().max().item(), (embed - fused_embed).abs().max().item())
+        raise RuntimeError(f"Fused model diverges from the trained model (max abs diff {max_diff:.3g})")
+
+
 # ----------------------
 # Model Loader
 # ----------------------
-def load_model(model_path: str = "model/best_model.pth", device=None) -> MyModel:
+def load_model(
+    model_path: str = "model/best_model.pth",
+    device=None,
+    fuse: bool = False,
+    d_shape: int = 64,
+    verify_batch_size: int = 8
+) -> nn.Module:
     """
     Load the trained model for inference.
+    With fuse=True the BatchNorm-folded FusedMyModel is returned after
+    checking it against the unfused weights on a batch of verify_batch_size
+    d_shape x d_shape inputs, the shape the server will feed it.
     """
     if device is None:
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -73,4 +150,42 @@ def load_model(model_path: str = "model/best_model.pth", device=None) -> MyModel
     state_dict = torch.load(model_file, map_location=device)
     model.load_state_dict(state_dict)
     model.eval()
+
+    if fuse:
+        fused = fuse_model(model)
+        verify_fused(model, fused, batch_size=verify_batch_size, d_shape=d_shape)
+        return fused
     return model
+
+
+# ----------------------
+# Compiled Inference
+# ----------------------
+def compile_model(
+    model: nn.Module,
+    mode: str = "eager",
+    example_input: torch.Tensor = None,
+    d_shape: int = 64
+) -> nn.Module:
+    """
+    Prepare a loaded model for the configured inference mode:
+    "eager" returns it unchanged, "torchscript" traces and freezes it
+    (on `example_input`, or a single d_shape x d_shape input),
+    "compile" wraps it with torch.compile (compiled lazily on first call).
+    """
+    if mode == "eager":
+        return model
+
+    if mode == "torchscript":
+        if example_input is None:
+            device = next(model.parameters()).device
+            example_input = torch.zeros(1, 1, d_shape, d_shape, device=device)
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example_input)
+        return torch.jit.freeze(traced)
+
+    if mode == "compile":
+        # Static shapes: batches are padded to a fixed set of bucket sizes
+        return torch.compile(model, dynamic=False)
+
+    raise ValueError(f"Unknown inference mode: {mode}")
@@ -0,0 +1,112 @@
+import copy
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from pathlib import Path
+from typing import Iterable
+from torch.ao.quantization import (
+    DeQuantStub,
+    QuantStub,
+    convert,
+    fuse_modules,
+    get_default_qconfig,
+    prepare,
+    quantize_dynamic,
+)
+
+from models.ml_model import MyModel
+
+# ----------------------
+# Quantizable Architecture
+# ----------------------
+class QuantizableMyModel(nn.Module):
+    """
+    MyModel rearranged for post-training quantization: the three conv blocks
+    become fused conv+bn+relu modules between quant/dequant stubs (static INT8),
+    while fc1/fc2 stay float here and are dynamically quantized afterwards.
+    """
+    def __init__(self, model: MyModel):
+        super(QuantizableMyModel, self).__init__()
+        self.quant = QuantStub()
+        self.block1 = nn.Sequential(model.conv1, model.bn1, nn.ReLU())
+        self.block2 = nn.Sequential(model.conv2, model.bn2, nn.ReLU())
+        self.block3 = nn.Sequential(model.conv3, model.bn3, nn.ReLU())
+        self.pool = nn.MaxPool2d(2, 2)
+        self.global_pool = nn.AdaptiveAvgPool2d(1)
+        self.dequant = DeQuantStub()
+
+        self.fc1 = model.fc1
+        self.bn_fc1 = model.bn_fc1
+        self.fc2 = model.fc2
+
+    def fuse(self) -> None:
+        """Fuse conv+bn+relu in each block (eval mode)"""
+        for block in (self.block1, self.block2, self.block3):
+            fuse_modules(block, [["0", "1", "2"]], inplace=True)
+
+    def forward(self, x):
+        x = self.quant(x)
+        x = self.pool(self.block1(x))
+        x = self.pool(self.block2(x))
+        x = self.pool(self.block3(x))
+        x = self.global_pool(x)
+        x = self.dequant(x)
+        x = torch.flatten(x, 1)
+
+        embed = self.fc1(x)
+        x = F.relu(self.bn_fc1(embed))
+        x = self.fc2(x)
+        return x, embed  # logits + embeddings
+
+
+# ----------------------
+# Post-Training Quantization
+# ----------------------
+def quantize_model(model: MyModel, calibration_batches: Iterable[torch.Tensor], d_shape: int = 64) -> nn.Module:
+    """
+    Static INT8 quantization of the conv blocks, calibrated on sample
+    spectrogram batches, plus dynamic INT8 quantization of fc1/fc2.
+    Returns a TorchScript module, traced on a d_shape x d_shape input,
+    ready for torch.jit.save.
+    """
+    engine = torch.backends.quantized.engine
+    qmodel = QuantizableMyModel(copy.deepcopy(model).cpu().eval()).eval()
+    qmodel.fuse()
+
+    # Only the conv path is statically quantized
+    qmodel.qconfig = get_default_qconfig(engine)
+    for name in ("fc1", "bn_fc1", "fc2"):
+        getattr(qmodel, name).qconfig = None
+    prepare(qmodel, inplace=True)
+
+    with torch.no_grad():
+        for batch in calibration_batches:
+            qmodel(batch.cpu())
+
+    convert(qmodel, inplace=True)
+    qmodel = quantize_dynamic(qmodel, {nn.Linear}, dtype=torch.qint8)
+
+    with torch.no_grad():
+        example = torch.zeros(1, 1, d_shape, d_shape)
+        scripted = torch.jit.trace(qmodel, example)
+    return torch.jit.freeze(scripted)
+
+
+def save_quantized_model(model: nn.Module, output_path: str) -> None:
+    """Write a quantized TorchScript artifact"""
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    torch.jit.save(model, output_path)
+
+
+def load_quantized_model(model_path: str, device=None) -> nn.Module:
+    """Load a quantized TorchScript artifact for CPU inference"""
+    if device is not None and torch.device(device).type != "cpu":
+        raise ValueError("INT8 quantized inference is only supported on CPU")
+
+    model_file = Path(model_path)
+    if not model_file.exists():
+        raise FileNotFoundError(f"Quantized model file not found at {model_file.resolve()}")
+
+    model = torch.jit.load(str(model_file), map_location="cpu")
+    model.eval()
+    return model
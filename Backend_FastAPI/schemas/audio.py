@@ -6,8 +6,32 @@ class PredictionResponse(BaseModel):
     average_probabilities: Dict[str, float]
     segment_predictions: List[Dict[str, Any]]
     total_segments: int
+    # Non-speech segments left out of the prediction when VAD is enabled
+    skipped_segments: int = 0
     record_id: Optional[str] = None
 
+class BatchItemResponse(BaseModel):
+    filename: str
+    # Exactly one of prediction and error is set
+    prediction: Optional[PredictionResponse] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    results: List[BatchItemResponse]
+    total_files: int
+    failed_files: int
+
+class JobResponse(BaseModel):
+    job_id: str
+    # queued, running, completed or failed
+    status: str
+    submitted_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    # Set once the job has completed, including the saved record_id
+    result: Optional[PredictionResponse] = None
+    error: Optional[str] = None
+
 class HistoryResponse(BaseModel):
     id: str
     timestamp: str
@@ -0,0 +1,45 @@
+"""
+Benchmark the BatchNorm-folded FusedMyModel against the eval-mode MyModel.
+
+Usage (from Backend_FastAPI/):
+    python -m scripts.benchmark_fusion --model model/best_model.pth --batch-sizes 1 16 64
+"""
+import argparse
+
+import torch
+
+from core.config import get_settings
+from models.ml_model import load_model, verify_fused
+from scripts.timing import time_forward
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Conv-BatchNorm folding")
+    parser.add_argument("--model", default="model/best_model.pth")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--d-shape", type=int, default=get_settings().d_shape)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    device = torch.device("cpu")
+    model = load_model(args.model, device)
+    fused = load_model(args.model, device, fuse=True, d_shape=args.d_shape)
+
+    # Raises if logits/embeddings differ beyond tolerance
+    verify_fused(model, fused, batch_size=max(args.batch_sizes), d_shape=args.d_shape)
+    print("Fused model matches the trained weights\n")
+
+    print(f"{'batch':>6} {'eager ms':>10} {'fused ms':>10} {'saved ms':>10} {'speedup':>8}")
+    for batch_size in args.batch_sizes:
+        inputs = torch.rand(batch_size, 1, args.d_shape, args.d_shape)
+        eager_ms = time_forward(model, inputs, args.iterations)
+        fused_ms = time_forward(fused, inputs, args.iterations)
+        print(f"{batch_size:>6} {eager_ms:>10.2f} {fused_ms:>10.2f} {eager_ms - fused_ms:>10.2f} {eager_ms / fused_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
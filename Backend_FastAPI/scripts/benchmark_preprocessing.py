@@ -0,0 +1,102 @@
+"""
+Compare preprocessing throughput of the thread stage and the process pool.
+
+Featurises the given recordings concurrently (no inference) with the
+preprocessing threads and with PREPROCESS_PROCESSES worker processes, checks
+both produce the same features and reports recordings per second plus the
+pool's per-worker utilisation.
+
+Usage (from Backend_FastAPI/):
+    python -m scripts.benchmark_preprocessing recording.wav recording.mp3 --processes 4 --concurrency 16
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from core.config import get_settings
+from services.audio_processing import AudioProcessor
+from services.ml_service import MLService
+from services.pipeline import PipelineStage
+from services.process_pool import PreprocessPool
+
+
+async def featurise_threads(stage: PipelineStage, processor: AudioProcessor, content: bytes, kwargs) -> np.ndarray:
+    chunks = processor.iter_feature_chunks(content, **kwargs)
+    features = []
+    while True:
+        chunk = await stage.run(next, chunks, None)
+        if chunk is None:
+            break
+        features.append(chunk.features.numpy().copy())
+    return np.concatenate(features)
+
+
+async def featurise_pool(pool: PreprocessPool, content: bytes, kwargs) -> np.ndarray:
+    stream = await pool.open(content, **kwargs)
+    features = []
+    while True:
+        chunk = await pool.next(stream)
+        if chunk is None:
+            break
+        features.append(chunk.features.numpy().copy())
+        pool.release(chunk.buffer)
+    return np.concatenate(features)
+
+
+async def run(args, settings, contents):
+    kwargs = dict(MLService._feature_kwargs(settings), chunk_size=settings.inference_chunk_size)
+    jobs = [contents[i % len(contents)] for i in range(args.concurrency)]
+
+    stage = PipelineStage("preprocess", workers=args.processes, max_in_flight=args.concurrency)
+    processor = AudioProcessor(temp_dir=settings.decode_temp_dir)
+    await asyncio.gather(*[featurise_threads(stage, processor, content, kwargs) for content in contents])
+    started = time.perf_counter()
+    thread_features = await asyncio.gather(*[featurise_threads(stage, processor, content, kwargs) for content in jobs])
+    thread_s = time.perf_counter() - started
+    stage.shutdown()
+
+    pool = PreprocessPool(
+        args.processes,
+        max_in_flight=args.concurrency,
+        processor_kwargs={"temp_dir": settings.decode_temp_dir},
+        feature_kwargs=MLService._feature_kwargs(settings),
+        chunk_size=settings.inference_chunk_size
+    )
+    await asyncio.get_running_loop().run_in_executor(None, pool.start)
+    try:
+        await asyncio.gather(*[featurise_pool(pool, content, kwargs) for content in contents])
+        started = time.perf_counter()
+        pool_features = await asyncio.gather(*[featurise_pool(pool, content, kwargs) for content in jobs])
+        pool_s = time.perf_counter() - started
+        workers = pool.stats()["workers"]
+    finally:
+        pool.shutdown()
+
+    max_diff = max(float(np.abs(a - b).max()) if a.size else 0.0 for a, b in zip(thread_features, pool_features))
+    print(f"{args.concurrency} recordings, {args.processes} threads vs {args.processes} processes")
+    print(f"  threads   {thread_s:>7.2f}s  {args.concurrency / thread_s:>7.1f} rec/s")
+    print(f"  processes {pool_s:>7.2f}s  {args.concurrency / pool_s:>7.1f} rec/s  ({thread_s / pool_s:.2f}x)")
+    print(f"  max feature diff {max_diff:.2e}")
+    for index, worker in enumerate(workers):
+        print(f"  worker {index}: {worker['completed']} calls, utilisation {worker['utilisation']:.1%}")
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Benchmark thread vs process preprocessing")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--processes", type=int, default=max(settings.preprocess_processes, 2))
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    contents = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            contents.append(f.read())
+    asyncio.run(run(args, settings, contents))
+
+
+if __name__ == "__main__":
+    main()
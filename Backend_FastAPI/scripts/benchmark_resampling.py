@@ -0,0 +1,119 @@
+"""
+Benchmark the resamplers and report their accuracy drift against the current
+output (soxr "HQ", identical to librosa.load).
+
+For every file and resampler this prints resampling throughput, waveform
+error against the reference (max abs difference and SNR) and, with --model,
+the largest change in average class probability and whether the overall
+prediction changes.
+
+Usage (from Backend_FastAPI/):
+    python -m scripts.benchmark_resampling recording_44k.wav recording_48k.ogg --model model/best_model.pth
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import torch
+
+from core.config import get_settings
+from models.ml_model import load_model
+from services.audio_processing import AudioProcessor
+from services.resampling import create_resampler
+
+CANDIDATES = [
+    ("soxr", "HQ"),
+    ("soxr", "MQ"),
+    ("soxr", "LQ"),
+    ("soxr", "QQ"),
+]
+
+
+def decode_native(processor: AudioProcessor, content: bytes, sr: int):
+    """Mono waveform at the file's own sample rate (ffmpeg-decoded files arrive at `sr`)"""
+    decoded = processor.decoder.open(io.BytesIO(content), sr)
+    blocks = [block.mean(axis=1) for block in decoded.blocks]
+    return np.concatenate(blocks), decoded.info.sample_rate
+
+
+def resample(resampler, y: np.ndarray, in_rate: int, out_rate: int) -> np.ndarray:
+    """Feed one-second blocks through a stream, as decoding does"""
+    with resampler.stream(in_rate, out_rate) as fn:
+        out = [fn(y[start:start + in_rate]) for start in range(0, len(y), in_rate)]
+        out.append(fn(np.zeros(0, dtype=np.float32), last=True))
+    y_out = np.concatenate(out)
+    return y_out[:int(np.ceil(len(y) * float(out_rate) / in_rate))]
+
+
+def average_probabilities(model, processor: AudioProcessor, y: np.ndarray, settings) -> np.ndarray:
+    features = processor.extract_features(
+        y, 0, None, settings.sample_rate, settings.n_fft, settings.hop_length, settings.win_length,
+        settings.n_mels, settings.d_shape, settings.segment_length, settings.segment_hop,
+        settings.segment_tail, settings.stft_mode
+    )
+    with torch.no_grad():
+        logits, _ = model(features)
+    return torch.softmax(logits, dim=1).mean(dim=0).numpy()
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Benchmark resamplers and report accuracy drift")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--sr", type=int, default=settings.sample_rate)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--model", default=None, help="also report prediction drift with this checkpoint")
+    args = parser.parse_args()
+
+    processor = AudioProcessor()
+    model = load_model(args.model, torch.device("cpu")) if args.model else None
+
+    for path in args.files:
+        with open(path, "rb") as f:
+            y_native, native_rate = decode_native(processor, f.read(), args.sr)
+        duration = len(y_native) / native_rate
+        print(f"\n{path}: {duration:.1f}s at {native_rate} Hz -> {args.sr} Hz")
+        if native_rate == args.sr:
+            print("  native rate matches, resampling is skipped")
+            continue
+
+        header = f"  {'resampler':<14} {'ms':>8} {'x realtime':>11} {'speedup':>8} {'max diff':>10} {'SNR dB':>8}"
+        print(header + (f" {'max dP':>9} {'class':>6}" if model else ""))
+
+        reference = None
+        reference_ms = None
+        reference_probs = None
+        for kind, quality in CANDIDATES:
+            resampler = create_resampler(kind, quality)
+            # First pass designs the filter; pooled/cached afterwards
+            y = resample(resampler, y_native, native_rate, args.sr)
+            started = time.perf_counter()
+            for _ in range(args.repeats):
+                resample(resampler, y_native, native_rate, args.sr)
+            elapsed_ms = 1000.0 * (time.perf_counter() - started) / args.repeats
+
+            if reference is None:
+                reference, reference_ms = y, elapsed_ms
+            error = y - reference
+            max_diff = float(np.abs(error).max())
+            noise = float(np.sum(error.astype(np.float64) ** 2))
+            snr = 10.0 * np.log10(np.sum(reference.astype(np.float64) ** 2) / noise) if noise else float("inf")
+
+            name = f"{kind} {quality}"
+            line = (
+                f"  {name:<14} {elapsed_ms:>8.2f} {1000.0 * duration / elapsed_ms:>11.0f} "
+                f"{reference_ms / elapsed_ms:>7.2f}x {max_diff:>10.2e} {snr:>8.1f}"
+            )
+            if model is not None:
+                probs = average_probabilities(model, processor, y, settings)
+                if reference_probs is None:
+                    reference_probs = probs
+                drift = float(np.nanmax(np.abs(probs - reference_probs)))
+                same = "same" if np.nanargmax(probs) == np.nanargmax(reference_probs) else "CHANGED"
+                line += f" {drift:>9.2e} {same:>6}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
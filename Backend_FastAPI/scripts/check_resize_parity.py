@@ -0,0 +1,74 @@
+"""
+Check the precomputed bicubic resize operators against cv2.resize(INTER_CUBIC).
+
+Resizes random images and real mel-spectrograms for a range of input shapes
+with both implementations and exits non-zero if any output differs by more
+than --atol.
+
+Usage (from Backend_FastAPI/):
+    python -m scripts.check_resize_parity --audio recording.wav
+"""
+import argparse
+import sys
+
+import cv2
+import numpy as np
+
+from core.config import get_settings
+from services.audio_processing import AudioProcessor
+from services.feature_extraction import MelSpectrogramEngine, cubic_resize_matrix
+
+SHAPES = [(64, 63), (64, 32), (64, 126), (128, 63), (40, 101), (64, 64), (64, 5), (96, 20)]
+
+
+def resize_with_matrices(image: np.ndarray, d_shape: int) -> np.ndarray:
+    rows = cubic_resize_matrix(image.shape[0], d_shape)
+    cols = cubic_resize_matrix(image.shape[1], d_shape)
+    return rows @ image @ cols.T
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Check bicubic resize operators against OpenCV")
+    parser.add_argument("--audio", nargs="*", default=[], help="also compare spectrograms of these recordings")
+    parser.add_argument("--d-shape", type=int, default=settings.d_shape)
+    parser.add_argument("--atol", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    worst = 0.0
+
+    for shape in SHAPES:
+        image = rng.random(shape, dtype=np.float32)
+        expected = cv2.resize(image, dsize=(args.d_shape, args.d_shape), interpolation=cv2.INTER_CUBIC)
+        diff = float(np.abs(resize_with_matrices(image, args.d_shape) - expected).max())
+        worst = max(worst, diff)
+        print(f"random {shape[0]:>4}x{shape[1]:<4} max diff {diff:.2e}")
+
+    processor = AudioProcessor()
+    engine = MelSpectrogramEngine(
+        settings.sample_rate, settings.n_fft, settings.hop_length, settings.win_length,
+        settings.n_mels, args.d_shape
+    )
+    for path in args.audio:
+        y = processor.load_audio(path, sr=settings.sample_rate)
+        segments = processor.segment_audio(y, settings.segment_length, settings.sample_rate)
+        images = engine(segments).numpy()
+        diff = 0.0
+        for segment, image in zip(segments, images):
+            expected = processor.audio_to_melspectrogram(
+                segment, settings.sample_rate, settings.n_fft, settings.hop_length,
+                settings.win_length, settings.n_mels, args.d_shape
+            )
+            diff = max(diff, float(np.abs(image[0] - expected).max()))
+        worst = max(worst, diff)
+        print(f"{path}: {len(segments)} segments, max diff vs cv2 reference {diff:.2e}")
+
+    if worst > args.atol:
+        print(f"FAILED: max diff {worst:.2e} exceeds {args.atol:.0e}")
+        sys.exit(1)
+    print(f"OK: max diff {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
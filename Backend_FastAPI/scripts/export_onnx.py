@@ -0,0 +1,75 @@
+"""
+Export MyModel to ONNX for INFERENCE_BACKEND=onnxruntime.
+
+Usage (from Backend_FastAPI/):
+    python -m scripts.export_onnx --model model/best_model.pth --output model/best_model.onnx
+
+The graph takes "input" (batch, 1, d_shape, d_shape) with a dynamic batch axis and
+returns "logits" and "embeddings". When onnxruntime is installed the exported graph
+is checked against the PyTorch model before the script exits.
+"""
+import argparse
+
+import numpy as np
+import torch
+
+from core.config import get_settings
+from models.ml_model import load_model
+
+
+def export(model: torch.nn.Module, output_path: str, d_shape: int, opset: int) -> None:
+    """Write the model as an ONNX graph with a dynamic batch dimension"""
+    example = torch.zeros(1, 1, d_shape, d_shape)
+    torch.onnx.export(
+        model,
+        example,
+        output_path,
+        input_names=["input"],
+        output_names=["logits", "embeddings"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}, "embeddings": {0: "batch"}},
+        opset_version=opset,
+        dynamo=False,
+    )
+
+
+def verify(model: torch.nn.Module, output_path: str, d_shape: int, atol: float = 1e-3) -> None:
+    """Compare ONNX Runtime outputs with PyTorch on a random batch"""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(output_path, providers=["CPUExecutionProvider"])
+    inputs = torch.rand(8, 1, d_shape, d_shape)
+    with torch.no_grad():
+        logits, embeddings = model(inputs)
+    ort_logits, ort_embeddings = session.run(["logits", "embeddings"], {"input": inputs.numpy()})
+
+    max_diff = max(
+        np.abs(ort_logits - logits.numpy()).max(),
+        np.abs(ort_embeddings - embeddings.numpy()).max(),
+    )
+    if max_diff > atol:
+        raise SystemExit(f"ONNX graph diverges from PyTorch (max abs diff {max_diff:.3g})")
+    print(f"ONNX Runtime matches PyTorch (max abs diff {max_diff:.3g})")
+
+
+def main():
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(description="Export MyModel to ONNX")
+    parser.add_argument("--model", default=settings.model_path)
+    parser.add_argument("--output", default=settings.onnx_model_path)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-fuse", action="store_true", help="Export without BatchNorm folding")
+    args = parser.parse_args()
+
+    model = load_model(args.model, torch.device("cpu"), fuse=not args.no_fuse)
+    export(model, args.output, settings.d_shape, args.opset)
+    print(f"Wrote ONNX model to {args.output}")
+
+    try:
+        verify(model, args.output, settings.d_shape)
+    except ImportError:
+        print("onnxruntime not installed, skipping verification")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measure steady-state memory allocation per prediction with tracemalloc.
+
+Runs a few warm-up predictions (filling the tensor arena and the per-thread
+feature scratch buffers), then traces the following ones and reports, per
+request, the peak of traced memory above what was live before it started and
+the net memory still held after it. Runs once with the tensor arena enabled
+and once without for comparison. The prediction cache is disabled so every
+request goes through decoding, featurisation and inference.
+
+Usage (from Backend_FastAPI/):
+    python -m scripts.profile_allocations recording.wav --requests 20
+"""
+import argparse
+import asyncio
+import tracemalloc
+
+import torch
+
+from core.config import get_settings
+from services.ml_service import MLService
+
+MB = 1024 * 1024
+
+
+async def profile(settings, contents, warmup: int, requests: int):
+    """(peak MB above baseline, net MB retained) for each traced request"""
+    service = MLService(settings.model_path, torch.device("cpu"), settings)
+    await service.load_model()
+    try:
+        for i in range(warmup):
+            await service.predict_audio(contents[i % len(contents)], settings)
+
+        results = []
+        tracemalloc.start()
+        for i in range(requests):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await service.predict_audio(contents[i % len(contents)], settings)
+            after, peak = tracemalloc.get_traced_memory()
+            results.append(((peak - before) / MB, (after - before) / MB))
+        tracemalloc.stop()
+        return results, service.get_metrics()["arena"]
+    finally:
+        await service.close()
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Profile per-request allocations with tracemalloc")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    contents = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            contents.append(f.read())
+    upload_mb = max(len(content) for content in contents) / MB
+
+    print(f"largest upload {upload_mb:.2f} MB, {args.warmup} warm-up and {args.requests} traced requests")
+    print(f"{'arena':<8} {'mean peak MB':>13} {'max peak MB':>12} {'mean net MB':>12}")
+    for enabled in (True, False):
+        run_settings = settings.model_copy(update={"arena_enabled": enabled, "prediction_cache_enabled": False})
+        results, arena = asyncio.run(profile(run_settings, contents, args.warmup, args.requests))
+        peaks = [peak for peak, _ in results]
+        nets = [net for _, net in results]
+        print(
+            f"{'on' if enabled else 'off':<8} {sum(peaks) / len(peaks):>13.2f} {max(peaks):>12.2f} "
+            f"{sum(nets) / len(nets):>12.3f}"
+        )
+        if arena is not None:
+            print(f"         arena: {arena['hits']} hits, {arena['misses']} misses, {arena['pooled_bytes'] / MB:.1f} MB pooled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Calibrate and write the INT8 quantized model, then compare it with fp32.
+
+Usage (from Backend_FastAPI/):
+    python -m scripts.quantize_model --audio-dir samples/ --output model/best_model_int8.pt \
+        [--eval-dir holdout/] [--report quantization_report.json]
+
+Calibration spectrograms come from the audio files in --audio-dir, preprocessed
+exactly as the API does. The comparison report uses --eval-dir when given
+(otherwise the calibration files) and covers per-segment and per-file class
+agreement, probability drift and forward-pass latency.
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import torch
+
+from core.config import get_settings
+from models.ml_model import load_model
+from models.quantization import load_quantized_model, quantize_model, save_quantized_model
+from scripts.timing import time_forward
+from services.audio_processing import AudioProcessor
+
+AUDIO_SUFFIXES = {".wav", ".mp3", ".ogg", ".flac"}
+
+
+def load_spectrograms(audio_dir: str, settings) -> Dict[str, torch.Tensor]:
+    """Preprocess every audio file in a directory into model inputs"""
+    processor = AudioProcessor(temp_dir=settings.decode_temp_dir)
+    spectrograms = {}
+    for path in sorted(Path(audio_dir).iterdir()):
+        if path.suffix.lower() not in AUDIO_SUFFIXES:
+            continue
+        mel_specs = processor.preprocess_audio(
+            str(path),
+            settings.sample_rate,
+            settings.n_fft,
+            settings.hop_length,
+            settings.win_length,
+            settings.n_mels,
+            settings.d_shape,
+            settings.segment_length,
+            settings.segment_hop,
+            settings.segment_tail,
+            settings.stft_mode
+        )
+        if len(mel_specs):
+            spectrograms[path.name] = mel_specs
+    return spectrograms
+
+
+def compare(fp32: torch.nn.Module, int8: torch.nn.Module, spectrograms: Dict[str, torch.Tensor],
+            batch_sizes: List[int], iterations: int, d_shape: int = 64) -> Dict:
+    """Accuracy and latency comparison of the two models"""
+    agree, total, file_agree = 0, 0, 0
+    max_drift, drift_sum = 0.0, 0.0
+
+    with torch.no_grad():
+        for mel_specs in spectrograms.values():
+            fp32_probs = torch.softmax(fp32(mel_specs)[0], dim=1)
+            int8_probs = torch.softmax(int8(mel_specs)[0], dim=1)
+            fp32_pred = fp32_probs.argmax(dim=1)
+            int8_pred = int8_probs.argmax(dim=1)
+
+            agree += int((fp32_pred == int8_pred).sum())
+            total += len(mel_specs)
+            file_agree += int(torch.bincount(fp32_pred).argmax() == torch.bincount(int8_pred).argmax())
+
+            drift = (fp32_probs - int8_probs).abs()
+            max_drift = max(max_drift, float(drift.max()))
+            drift_sum += float(drift.max(dim=1).values.sum())
+
+    latency = []
+    for batch_size in batch_sizes:
+        inputs = torch.rand(batch_size, 1, d_shape, d_shape)
+        fp32_ms = time_forward(fp32, inputs, iterations)
+        int8_ms = time_forward(int8, inputs, iterations)
+        latency.append({
+            "batch_size": batch_size,
+            "fp32_ms": round(fp32_ms, 3),
+            "int8_ms": round(int8_ms, 3),
+            "speedup": round(fp32_ms / int8_ms, 2),
+        })
+
+    return {
+        "files": len(spectrograms),
+        "segments": total,
+        "segment_agreement": agree / total if total else None,
+        "file_agreement": file_agree / len(spectrograms) if spectrograms else None,
+        "max_probability_drift": max_drift,
+        "mean_probability_drift": drift_sum / total if total else None,
+        "latency": latency,
+    }
+
+
+def main():
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization for MyModel")
+    parser.add_argument("--model", default=settings.model_path)
+    parser.add_argument("--audio-dir", required=True, help="Audio files used for calibration")
+    parser.add_argument("--eval-dir", default=None, help="Audio files used for the comparison report")
+    parser.add_argument("--output", default=settings.quantized_model_path)
+    parser.add_argument("--calibration-batch-size", type=int, default=32)
+    parser.add_argument("--max-calibration-segments", type=int, default=2048)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--report", default=None, help="Write the comparison report as JSON")
+    args = parser.parse_args()
+
+    calibration = load_spectrograms(args.audio_dir, settings)
+    if not calibration:
+        raise SystemExit(f"No usable audio found in {args.audio_dir}")
+
+    segments = torch.cat(list(calibration.values()))[:args.max_calibration_segments]
+    print(f"Calibrating on {len(segments)} segments from {len(calibration)} files")
+
+    fp32 = load_model(args.model, torch.device("cpu"))
+    int8 = quantize_model(fp32, torch.split(segments, args.calibration_batch_size), settings.d_shape)
+    save_quantized_model(int8, args.output)
+    print(f"Wrote quantized model to {args.output}")
+
+    # Compare the artifact as it will be loaded by the API
+    int8 = load_quantized_model(args.output)
+    evaluation = load_spectrograms(args.eval_dir, settings) if args.eval_dir else calibration
+    report = compare(fp32, int8, evaluation, args.batch_sizes, args.iterations, settings.d_shape)
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
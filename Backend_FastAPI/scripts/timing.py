@@ -0,0 +1,17 @@
+"""
+Timing helpers shared by the benchmark scripts.
+"""
+import time
+
+import torch
+
+
+def time_forward(model: torch.nn.Module, inputs: torch.Tensor, iterations: int) -> float:
+    """Average forward-pass latency in milliseconds"""
+    with torch.no_grad():
+        for _ in range(3):
+            model(inputs)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            model(inputs)
+    return 1000.0 * (time.perf_counter() - started) / iterations
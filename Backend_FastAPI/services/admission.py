@@ -0,0 +1,167 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+# Weight of the newest prediction in the running service-time average
+_SERVICE_TIME_SMOOTHING = 0.2
+
+
+class OverloadedError(Exception):
+    """The request was shed; `retry_after` is a suggested delay in whole seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        # Keep retry_after when raised in a preprocessing worker process
+        return type(self), (str(self), self.retry_after)
+
+
+class AdmissionSlot:
+    """An admitted request's hold on a concurrency slot and the time it has spent working in one"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started: Optional[float] = None
+        self.busy = 0.0
+
+    @property
+    def held(self) -> bool:
+        return self._started is not None
+
+    @asynccontextmanager
+    async def released(self) -> AsyncIterator[None]:
+        """
+        Give the slot up for the duration of the block, e.g. while a streamed
+        result waits on a slow client, and queue for one again afterwards
+        (without shedding). If the block raises, the slot is not taken back.
+        """
+        self._controller._release(self)
+        yield
+        await self._controller._acquire(self)
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue and load shedding.
+
+    At most `max_concurrency` admitted requests run at once and at most
+    `max_queue` wait for a slot. A request arriving when the queue is full,
+    or when its estimated queue time exceeds `latency_budget` seconds, is
+    rejected immediately with OverloadedError instead of waiting to time out.
+
+    Queue time is estimated from a running average of how long admitted
+    requests take: with every slot busy, a newcomer waits for roughly
+    (queued + 1) / max_concurrency service times.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 16, latency_budget: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.latency_budget = latency_budget
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._service_time: Optional[float] = None
+
+        # Metrics
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._queue_time = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def estimated_wait(self) -> float:
+        """Expected seconds a request arriving now would spend queued"""
+        if self._in_flight + self._queued < self.max_concurrency or self._service_time is None:
+            return 0.0
+        return (self._queued + 1) / self.max_concurrency * self._service_time
+
+    def check(self) -> None:
+        """Raise OverloadedError if a request arriving now would be shed"""
+        if self._in_flight + self._queued < self.max_concurrency:
+            return
+
+        estimate = self.estimated_wait()
+        if self._queued >= self.max_queue:
+            reason = f"{self._queued} requests already queued"
+        elif estimate > self.latency_budget:
+            reason = f"estimated queue time {estimate:.1f}s exceeds the {self.latency_budget:g}s budget"
+        else:
+            return
+
+        self._rejected += 1
+        raise OverloadedError(f"Server busy: {reason}", max(1, math.ceil(estimate)))
+
+    @asynccontextmanager
+    async def admit(self, shed: bool = True, record: bool = True) -> AsyncIterator[AdmissionSlot]:
+        """
+        Hold a slot for the duration of the block, queueing or shedding as
+        needed. Callers that are already bounded elsewhere (such as background
+        job workers) pass shed=False to always wait for a slot. The service
+        time recorded covers only the time the slot was actually held; see
+        AdmissionSlot.released. Work much smaller than a whole prediction
+        (such as one live window) passes record=False so it takes a slot
+        without skewing the average the queue-time estimate is based on.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        if shed:
+            self.check()
+
+        slot = AdmissionSlot(self)
+        await self._acquire(slot)
+        self._admitted += 1
+        try:
+            yield slot
+        finally:
+            if slot.held:
+                self._release(slot)
+
+            if record:
+                if self._service_time is None:
+                    self._service_time = slot.busy
+                else:
+                    self._service_time += _SERVICE_TIME_SMOOTHING * (slot.busy - self._service_time)
+
+    async def _acquire(self, slot: AdmissionSlot) -> None:
+        queued_at = time.perf_counter()
+        self._queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+
+        slot._started = time.perf_counter()
+        self._in_flight += 1
+        self._queue_time += slot._started - queued_at
+
+    def _release(self, slot: AdmissionSlot) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+        slot.busy += time.perf_counter() - slot._started
+        slot._started = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits, current load and shedding counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "latency_budget": self.latency_budget,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "estimated_wait": self.estimated_wait(),
+            "avg_service_time": self._service_time or 0.0,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "avg_queue_time": self._queue_time / self._admitted if self._admitted else 0.0,
+        }
@@ -1,31 +1,234 @@
+import io
+import os
+import tempfile
 import numpy as np
 import librosa
 import torch
-import cv2
-import os
-from typing import List
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional, Union
+
+from services.decoders import AudioDecoder
+from services.feature_extraction import MelSpectrogramEngine
+from services.resampling import create_resampler
+from services.tensor_arena import TensorArena
+from services.voice_activity import EnergyVAD
+
+# An audio source can be a file path, the raw bytes of an upload or a binary buffer
+AudioSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+@dataclass
+class FeatureChunk:
+    """Model input for a run of consecutive segments"""
+    # One row per featurised segment
+    features: torch.Tensor
+    # Recording-wide index of each row
+    segment_index: np.ndarray
+    # Voice-activity decision per row (all True without VAD)
+    speech: np.ndarray
+    # Non-speech segments of this run dropped before featurisation
+    skipped: int = 0
+    # Arena buffer backing `features`, to be released once they have been scored
+    buffer: Optional[np.ndarray] = None
 
 class AudioProcessor:
     """Service for audio processing operations"""
     
-    def load_audio(self, file_path: str, sr: int = 16000) -> np.ndarray:
-        """Load audio file and return the audio time series"""
-        y, _ = librosa.load(file_path, sr=sr)
+    def __init__(
+        self, 
+        temp_dir: Optional[str] = None, 
+        max_duration: Optional[float] = None, 
+        memmap_threshold: int = 8 * 1024 * 1024, 
+        ffmpeg_processes: int = 2, 
+        resampler: str = "soxr", 
+        resampler_quality: str = "HQ"
+    ):
+        # Only used for formats that cannot be decoded from memory
+        self.temp_dir = temp_dir
+        self.decoder = AudioDecoder(
+            max_duration=max_duration,
+            memmap_threshold=memmap_threshold,
+            ffmpeg_processes=ffmpeg_processes
+        )
+        self.resampler = create_resampler(resampler, resampler_quality)
+
+    def _open_buffer(self, source: AudioSource) -> BinaryIO:
+        """Seekable binary buffer over in-memory or streamed input"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return io.BytesIO(source)
+        if source.seekable():
+            return source
+        return io.BytesIO(source.read())
+
+    def load_audio(self, source: AudioSource, sr: int = 16000) -> np.ndarray:
+        """Load audio from a path, raw bytes or a buffer and return the audio time series"""
+        # Larger blocks than streaming uses: nothing downstream waits on the first one
+        blocks = list(self.iter_decoded(source, sr=sr, blocksize=1 << 16))
+        if len(blocks) == 1:
+            return blocks[0]
+        if not blocks:
+            return np.empty(0, dtype=np.float32)
+        return np.concatenate(blocks)
+
+    def iter_decoded(self, source: AudioSource, sr: int = 16000, blocksize: int = 16000) -> Iterator[np.ndarray]:
+        """
+        Decode and resample audio incrementally, yielding mono float32 blocks at `sr`.
+        Concatenated, the blocks equal `librosa.load(source, sr=sr)`: channels are
+        averaged, audio already at `sr` is passed through untouched and the default
+        soxr "HQ" resampler uses the same filter as librosa.
+        The header is validated before any samples are decoded (AudioFormatError);
+        formats no fast decoder handles go through librosa's fallback chain in one go.
+        """
+        is_path = isinstance(source, (str, os.PathLike))
+        stream = source if is_path else self._open_buffer(source)
+        decoded = self.decoder.open(stream, sr, blocksize)
+        if decoded is None:
+            if is_path:
+                y, _ = librosa.load(source, sr=sr)
+            else:
+                # Fall back to a seekable file for decoders that need a path (audioread)
+                y = self._load_via_tempfile(stream, sr=sr)
+            yield y
+            return
+        
+        info = decoded.info
+        if info.sample_rate == sr:
+            # Already at the model rate: no resampling pass at all
+            for block in decoded.blocks:
+                mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                if len(mono):
+                    yield mono
+            return
+        
+        # librosa fixes the resampled length to ceil(frames * ratio)
+        target_length = np.iinfo(np.int64).max
+        if info.frames is not None:
+            target_length = int(np.ceil(info.frames * float(sr) / info.sample_rate))
+        
+        emitted = 0
+        with self.resampler.stream(info.sample_rate, sr) as resample:
+            for block in decoded.blocks:
+                mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                mono = resample(mono, last=False)[:target_length - emitted]
+                emitted += len(mono)
+                if len(mono):
+                    yield mono
+            
+            rest = resample(np.zeros(0, dtype=np.float32), last=True)[:target_length - emitted]
+            emitted += len(rest)
+            if len(rest):
+                yield rest
+        if info.frames is not None and emitted < target_length:
+            yield np.zeros(target_length - emitted, dtype=np.float32)
+
+    def iter_segments(
+        self, 
+        source: AudioSource, 
+        sr: int = 16000, 
+        segment_length: float = 1.0, 
+        segment_hop: Optional[float] = None, 
+        tail: str = "drop"
+    ) -> Iterator[np.ndarray]:
+        """
+        Yield (samples,) segments while the audio is still being decoded, keeping
+        only a carry-over buffer shorter than one segment plus the current block.
+        Produces the same segments as `segment_audio` followed by `segment_tail`
+        on the fully decoded recording; the tail comes last, if kept.
+        """
+        if tail not in ("drop", "pad", "short"):
+            raise ValueError(f"Unknown segment tail mode: {tail}")
+        
+        samples_per_segment = int(segment_length * sr)
+        hop = int(segment_hop * sr) if segment_hop else samples_per_segment
+        
+        carry = np.empty(0, dtype=np.float32)
+        skip = 0  # samples still to discard when the hop is longer than a segment
+        total = 0
+        num_segments = 0
+        for block in self.iter_decoded(source, sr=sr):
+            total += len(block)
+            dropped = min(skip, len(block))
+            skip -= dropped
+            carry = np.concatenate([carry, block[dropped:]])
+            
+            start = 0
+            while len(carry) - start >= samples_per_segment:
+                yield carry[start:start + samples_per_segment]
+                num_segments += 1
+                start += hop
+            skip += max(start - len(carry), 0)
+            carry = carry[start:]
+        
+        covered = (num_segments - 1) * hop + samples_per_segment if num_segments else 0
+        if tail == "drop" or total <= covered or skip or carry.size == 0:
+            return
+        
+        if tail == "pad":
+            padded = np.zeros(samples_per_segment, dtype=np.float32)
+            padded[:carry.size] = carry
+            yield padded
+        else:
+            yield carry.copy()
+
+    def _load_via_tempfile(self, buffer: BinaryIO, sr: int = 16000) -> np.ndarray:
+        """Decode a buffer through a short-lived temp file (tmpfs when configured)"""
+        with tempfile.NamedTemporaryFile(dir=self.temp_dir) as tmp:
+            tmp.write(buffer.read())
+            tmp.flush()
+            y, _ = librosa.load(tmp.name, sr=sr)
         return y
 
-    def segment_audio(self, y: np.ndarray, segment_length: float = 1.0, sr: int = 16000) -> List[np.ndarray]:
-        """Segment audio into fixed-length segments"""
+    def segment_audio(
+        self, 
+        y: np.ndarray, 
+        segment_length: float = 1.0, 
+        sr: int = 16000, 
+        segment_hop: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Segment audio into fixed-length windows.
+        Returns a read-only (num_segments, samples) strided view of `y`, no data is copied.
+        A `segment_hop` shorter than `segment_length` gives overlapping windows.
+        """
         samples_per_segment = int(segment_length * sr)
-        num_segments = len(y) // samples_per_segment
+        hop = int(segment_hop * sr) if segment_hop else samples_per_segment
         
-        segments = []
-        for i in range(num_segments):
-            start = i * samples_per_segment
-            end = start + samples_per_segment
-            segment = y[start:end]
-            segments.append(segment)
+        if len(y) < samples_per_segment:
+            return np.empty((0, samples_per_segment), dtype=y.dtype)
         
-        return segments
+        windows = np.lib.stride_tricks.sliding_window_view(y, samples_per_segment)
+        return windows[::hop]
+
+    def segment_tail(
+        self, 
+        y: np.ndarray, 
+        segment_length: float = 1.0, 
+        sr: int = 16000, 
+        segment_hop: Optional[float] = None, 
+        tail: str = "drop"
+    ) -> Optional[np.ndarray]:
+        """
+        Return the audio left over after the last full segment as a (1, samples) matrix.
+        tail="drop" discards it, "pad" zero-pads it to a full segment and "short" keeps it as is.
+        """
+        if tail not in ("drop", "pad", "short"):
+            raise ValueError(f"Unknown segment tail mode: {tail}")
+        
+        samples_per_segment = int(segment_length * sr)
+        hop = int(segment_hop * sr) if segment_hop else samples_per_segment
+        
+        num_segments = 0 if len(y) < samples_per_segment else 1 + (len(y) - samples_per_segment) // hop
+        covered = (num_segments - 1) * hop + samples_per_segment if num_segments else 0
+        remainder = y[num_segments * hop:]
+        
+        if tail == "drop" or len(y) <= covered or remainder.size == 0:
+            return None
+        
+        if tail == "pad":
+            padded = np.zeros((1, samples_per_segment), dtype=y.dtype)
+            padded[0, :remainder.size] = remainder
+            return padded
+        
+        return remainder[np.newaxis]
 
     def audio_to_melspectrogram(
         self, 
@@ -37,7 +240,9 @@ class AudioProcessor:
         n_mels: int = 64, 
         d_shape: int = 64
     ) -> np.ndarray:
-        """Convert audio segment to mel-spectrogram"""
+        """Convert audio segment to mel-spectrogram (single-clip reference; the service uses MelSpectrogramEngine)"""
+        # Only this reference path needs OpenCV, so keep it out of worker startup
+        import cv2
         
         # Create mel-spectrogram
         mel_spec = librosa.feature.melspectrogram(
@@ -54,48 +259,261 @@ class AudioProcessor:
         log_spectrogram = librosa.amplitude_to_db(mel_spec)
         
         # Normalize
-        norm = (log_spectrogram - np.min(log_spectrogram)) / (np.max(log_spectrogram) - np.min(log_spectrogram))
+        value_range = np.max(log_spectrogram) - np.min(log_spectrogram)
+        # A constant spectrogram (digital silence) normalises to zeros rather than NaN
+        norm = (log_spectrogram - np.min(log_spectrogram)) / (value_range if value_range > 0 else 1.0)
         
         # Resize to target shape
         img = cv2.resize(norm, dsize=(d_shape, d_shape), interpolation=cv2.INTER_CUBIC)
         
         return img
 
+    def count_segments(
+        self, 
+        y: np.ndarray, 
+        segment_length: float = 1.0, 
+        sr: int = 16000, 
+        segment_hop: Optional[float] = None, 
+        segment_tail: str = "drop"
+    ) -> int:
+        """Number of model inputs `y` yields, including the tail if it is kept"""
+        segments = self.segment_audio(y, segment_length=segment_length, sr=sr, segment_hop=segment_hop)
+        tail = self.segment_tail(y, segment_length=segment_length, sr=sr, segment_hop=segment_hop, tail=segment_tail)
+        return len(segments) + (0 if tail is None else 1)
+        
+    def extract_features(
+        self, 
+        y: np.ndarray, 
+        start: int = 0, 
+        stop: Optional[int] = None, 
+        sr: int = 16000, 
+        n_fft: int = 1024, 
+        hop_length: int = 256, 
+        win_length: int = 1024, 
+        n_mels: int = 64, 
+        d_shape: int = 64,
+        segment_length: float = 1.0,
+        segment_hop: Optional[float] = None,
+        segment_tail: str = "drop",
+        stft_mode: str = "segment",
+        mask: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None
+    ) -> torch.Tensor:
+        """
+        Model input for segments [start, stop) of a decoded recording; the kept
+        tail, if any, is the last index. Any sub-range gives exactly the rows the
+        whole recording would, so long recordings can be featurised in chunks.
+        A boolean `mask` over the range featurises only the selected segments.
+        With `out` the features are written into its leading rows, which the
+        returned tensor shares.
+        """
+        
+        # Segment audio into a strided (num_segments, samples) view plus the optional tail
+        segments = self.segment_audio(y, segment_length=segment_length, sr=sr, segment_hop=segment_hop)
+        tail = self.segment_tail(
+            y, segment_length=segment_length, sr=sr, segment_hop=segment_hop, tail=segment_tail
+        )
+        total = len(segments) + (0 if tail is None else 1)
+        stop = total if stop is None else min(stop, total)
+        start = min(start, stop)
+        
+        rows = np.arange(start, stop)
+        if mask is not None:
+            rows = rows[mask]
+        full_rows = rows[rows < len(segments)]
+        num_full = len(full_rows)
+        
+        # Batched mel-spectrograms written straight into one (N, 1, d_shape, d_shape) array
+        engine = MelSpectrogramEngine(sr, n_fft, hop_length, win_length, n_mels, d_shape)
+        if out is None:
+            mel_specs = np.empty((len(rows), 1, d_shape, d_shape), dtype=np.float32)
+        else:
+            mel_specs = out[:len(rows)]
+        
+        if stft_mode == "shared":
+            # One STFT over the frames these segments cover, sliced into per-segment frame windows
+            if num_full:
+                hop = int(segment_hop * sr) if segment_hop else segments.shape[1]
+                engine.shared_images(y, full_rows * hop, segments.shape[1], out=mel_specs[:num_full])
+        elif stft_mode == "segment":
+            selected = segments[start:start + num_full] if mask is None else segments[full_rows]
+            engine(selected, out=mel_specs[:num_full])
+        else:
+            raise ValueError(f"Unknown STFT mode: {stft_mode}")
+        if num_full < len(rows):
+            engine(tail, out=mel_specs[num_full:])
+        
+        return torch.from_numpy(mel_specs)
+    
     def preprocess_audio(
         self, 
-        file_path: str, 
+        source: AudioSource, 
         sr: int = 16000, 
         n_fft: int = 1024, 
         hop_length: int = 256, 
         win_length: int = 1024, 
         n_mels: int = 64, 
-        d_shape: int = 64
+        d_shape: int = 64,
+        segment_length: float = 1.0,
+        segment_hop: Optional[float] = None,
+        segment_tail: str = "drop",
+        stft_mode: str = "segment"
     ) -> torch.Tensor:
-        """Preprocess audio file for model input"""
+        """Preprocess an audio file or in-memory upload for model input"""
         
         # Load audio
-        y = self.load_audio(file_path, sr=sr)
-        
-        # Segment audio
-        segments = self.segment_audio(y, sr=sr)
-        
-        # Convert each segment to mel-spectrogram
-        mel_specs = []
-        for segment in segments:
-            mel_spec = self.audio_to_melspectrogram(
-                segment, 
-                sr=sr, 
-                n_fft=n_fft, 
-                hop_length=hop_length, 
-                win_length=win_length, 
-                n_mels=n_mels, 
-                d_shape=d_shape
+        y = self.load_audio(source, sr=sr)
+        
+        return self.extract_features(
+            y, 0, None, sr, n_fft, hop_length, win_length, n_mels, d_shape,
+            segment_length, segment_hop, segment_tail, stft_mode
+        )
+    
+    def featurise_segments(
+        self, 
+        rows: np.ndarray, 
+        first_index: int = 0, 
+        sr: int = 16000, 
+        n_fft: int = 1024, 
+        hop_length: int = 256, 
+        win_length: int = 1024, 
+        n_mels: int = 64, 
+        d_shape: int = 64,
+        vad: Optional[EnergyVAD] = None,
+        drop_non_speech: bool = True,
+        arena: Optional[TensorArena] = None
+    ) -> FeatureChunk:
+        """
+        FeatureChunk for a (num_segments, samples) matrix of consecutive segments,
+        the first being segment `first_index` of its recording. VAD gating and
+        arena buffers work as in iter_feature_chunks; dropped non-speech rows are
+        compacted out of `rows` in place, so it must be a writable scratch array.
+        """
+        index = np.arange(first_index, first_index + len(rows))
+        if vad is None:
+            speech = np.ones(len(rows), dtype=bool)
+        else:
+            speech = vad(rows)
+        
+        skipped = 0
+        if vad is not None and drop_non_speech:
+            # Compact speech rows to the front in place rather than copying them out
+            kept = np.flatnonzero(speech)
+            for position, row in enumerate(kept):
+                if position != row:
+                    rows[position] = rows[row]
+            rows = rows[:len(kept)]
+            index, speech, skipped = index[kept], speech[kept], len(speech) - len(kept)
+        
+        buffer = None if arena is None else arena.acquire(len(rows), (1, d_shape, d_shape))
+        engine = MelSpectrogramEngine(sr, n_fft, hop_length, win_length, n_mels, d_shape)
+        features = engine(rows, out=None if buffer is None else buffer[:len(rows)])
+        return FeatureChunk(features, index, speech, skipped, buffer)
+    
+    def iter_feature_chunks(
+        self, 
+        source: AudioSource, 
+        sr: int = 16000, 
+        n_fft: int = 1024, 
+        hop_length: int = 256, 
+        win_length: int = 1024, 
+        n_mels: int = 64, 
+        d_shape: int = 64,
+        segment_length: float = 1.0,
+        segment_hop: Optional[float] = None,
+        segment_tail: str = "drop",
+        stft_mode: str = "segment",
+        chunk_size: int = 256,
+        vad: Optional[EnergyVAD] = None,
+        drop_non_speech: bool = True,
+        arena: Optional[TensorArena] = None
+    ) -> Iterator[FeatureChunk]:
+        """
+        Model input for an audio source in chunks of at most `chunk_size` segments.
+        In "segment" STFT mode the source is decoded as it is consumed, so the first
+        chunk is ready after decoding only its own audio; "shared" mode needs
+        neighbouring frames and decodes the whole recording up front.
+        
+        With a `vad`, segments are classified before feature extraction; non-speech
+        segments are either never featurised (`drop_non_speech`) or featurised and
+        flagged in `FeatureChunk.speech`.
+        
+        With an `arena`, features are written into pooled buffers (handed over in
+        `FeatureChunk.buffer` for the caller to release) and the raw segment batch
+        is borrowed from it too, so steady-state extraction allocates nothing large.
+        """
+        def feature_buffer(n: int) -> Optional[np.ndarray]:
+            return None if arena is None else arena.acquire(n, (1, d_shape, d_shape))
+        
+        if stft_mode == "shared":
+            y = self.load_audio(source, sr=sr)
+            segments = self.segment_audio(y, segment_length=segment_length, sr=sr, segment_hop=segment_hop)
+            tail = self.segment_tail(
+                y, segment_length=segment_length, sr=sr, segment_hop=segment_hop, tail=segment_tail
+            )
+            total = len(segments) + (0 if tail is None else 1)
+            
+            for start in range(0, total, chunk_size):
+                stop = min(start + chunk_size, total)
+                speech = np.ones(stop - start, dtype=bool)
+                if vad is not None:
+                    full = segments[start:stop]
+                    speech[:len(full)] = vad(full)
+                    if stop > len(segments):
+                        speech[-1] = vad(tail)[0]
+                keep = speech if vad is not None and drop_non_speech else None
+                
+                buffer = feature_buffer(stop - start)
+                features = self.extract_features(
+                    y, start, stop, sr, n_fft, hop_length, win_length, n_mels, d_shape,
+                    segment_length, segment_hop, segment_tail, stft_mode, mask=keep, out=buffer
+                )
+                index = np.arange(start, stop)
+                if keep is None:
+                    yield FeatureChunk(features, index, speech, buffer=buffer)
+                else:
+                    yield FeatureChunk(
+                        features, index[keep], speech[keep], int(np.count_nonzero(~keep)), buffer=buffer
+                    )
+            return
+        if stft_mode != "segment":
+            raise ValueError(f"Unknown STFT mode: {stft_mode}")
+        
+        def featurise(rows: np.ndarray, first_index: int) -> FeatureChunk:
+            return self.featurise_segments(
+                rows, first_index, sr, n_fft, hop_length, win_length, n_mels, d_shape,
+                vad=vad, drop_non_speech=drop_non_speech, arena=arena
             )
-            mel_specs.append(mel_spec)
         
-        # Convert to numpy array and add channel dimension
-        mel_specs = np.array(mel_specs)
-        mel_specs = np.expand_dims(mel_specs, axis=1)
-        mel_specs = torch.FloatTensor(mel_specs)
+        samples_per_segment = int(segment_length * sr)
+        if arena is None:
+            batch = np.empty((chunk_size, samples_per_segment), dtype=np.float32)
+        else:
+            batch = arena.acquire(chunk_size, (samples_per_segment,))
+        count = 0
+        first_index = 0
         
-        return mel_specs
\ No newline at end of file
+        try:
+            for segment in self.iter_segments(source, sr, segment_length, segment_hop, segment_tail):
+                if len(segment) != samples_per_segment:
+                    # A short tail is featurised on its own
+                    if count:
+                        yield featurise(batch[:count], first_index)
+                        first_index += count
+                        count = 0
+                    yield featurise(segment[np.newaxis], first_index)
+                    first_index += 1
+                    continue
+                
+                batch[count] = segment
+                count += 1
+                if count == chunk_size:
+                    yield featurise(batch[:count], first_index)
+                    first_index += count
+                    count = 0
+            
+            if count:
+                yield featurise(batch[:count], first_index)
+        finally:
+            if arena is not None:
+                arena.release(batch)
@@ -0,0 +1,202 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import torch
+
+from services.tensor_arena import TensorArena
+
+# forward(batch) -> (logits, embeddings), run off the event loop
+ForwardFn = Callable[[torch.Tensor], Tuple[torch.Tensor, torch.Tensor]]
+
+# run(fn, *args) -> awaitable result of fn(*args) on a worker thread
+RunFn = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class _PendingBatch:
+    """Segments from one request waiting to be scored"""
+    inputs: torch.Tensor
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching scheduler.
+
+    Concurrent requests submit their segment tensors; a single dispatcher task
+    groups them into one forward pass of up to `max_batch_size` segments, waiting
+    at most `max_wait_ms` after the first queued request, then scatters the
+    logits/embeddings back to each request's future.
+
+    Concatenating, scoring and splitting batches all happen inside `run`, so
+    the event loop itself never executes torch kernels. A lone request is scored
+    without concatenation; several are concatenated into a buffer borrowed from
+    `arena` when one is given.
+    """
+
+    def __init__(
+        self, 
+        forward: ForwardFn, 
+        max_batch_size: int = 64, 
+        max_wait_ms: float = 5.0, 
+        run: Optional[RunFn] = None,
+        arena: Optional[TensorArena] = None
+    ):
+        self.forward = forward
+        self.arena = arena
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.run = run or self._run_in_default_executor
+
+        self._pending: Deque[_PendingBatch] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self._batches = 0
+        self._segments = 0
+        self._requests = 0
+        self._dispatched = 0
+        self._wait_time = 0.0
+
+    @staticmethod
+    async def _run_in_default_executor(fn: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    def start(self) -> None:
+        """Start the dispatcher task on the running event loop"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self) -> None:
+        """Stop the dispatcher and fail any requests still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while self._pending:
+            pending = self._pending.popleft()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Batching scheduler stopped"))
+
+    async def submit(self, inputs: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Queue a request's segments and wait for its (logits, embeddings)"""
+        if self._task is None:
+            raise RuntimeError("Batching scheduler not started")
+
+        loop = asyncio.get_running_loop()
+        futures = []
+
+        # Requests larger than one batch are split so they cannot starve others
+        for chunk in torch.split(inputs, self.max_batch_size):
+            future = loop.create_future()
+            self._pending.append(_PendingBatch(chunk, future))
+            futures.append(future)
+        self._requests += 1
+        self._wakeup.set()
+
+        results = await asyncio.gather(*futures)
+        if len(results) == 1:
+            return results[0]
+        return await self.run(_concat_results, results)
+
+    async def _collect(self) -> List[_PendingBatch]:
+        """Take queued requests until the batch is full or the deadline passes"""
+        loop = asyncio.get_running_loop()
+
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+        batch = [self._pending.popleft()]
+        size = len(batch[0].inputs)
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            if not self._pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                continue
+
+            # Leave requests that would overflow the batch for the next one
+            if size + len(self._pending[0].inputs) > self.max_batch_size:
+                break
+            pending = self._pending.popleft()
+            batch.append(pending)
+            size += len(pending.inputs)
+
+        return batch
+
+    def _forward_batch(self, inputs: List[torch.Tensor]) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        """Score several requests' segments in one forward pass and split the outputs"""
+        if len(inputs) == 1:
+            return [self.forward(inputs[0])]
+        
+        sizes = [len(chunk) for chunk in inputs]
+        if self.arena is None or inputs[0].device.type != "cpu":
+            logits, embeddings = self.forward(torch.cat(inputs))
+        else:
+            buffer = self.arena.acquire(sum(sizes), tuple(inputs[0].shape[1:]))
+            try:
+                batch = torch.from_numpy(buffer[:sum(sizes)])
+                logits, embeddings = self.forward(torch.cat(inputs, out=batch))
+            finally:
+                self.arena.release(buffer)
+        return list(zip(torch.split(logits, sizes), torch.split(embeddings, sizes)))
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+
+            try:
+                results = await self.run(self._forward_batch, [pending.inputs for pending in batch])
+            except Exception as e:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+
+            self._batches += 1
+            for pending, result in zip(batch, results):
+                self._segments += len(pending.inputs)
+                self._dispatched += 1
+                self._wait_time += started - pending.enqueued_at
+                if not pending.future.done():
+                    pending.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Tunables, queue depth and throughput counters"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": len(self._pending),
+            "queued_segments": sum(len(pending.inputs) for pending in self._pending),
+            "requests": self._requests,
+            "batches": self._batches,
+            "segments": self._segments,
+            "avg_batch_size": self._segments / self._batches if self._batches else 0.0,
+            "avg_queue_wait_ms": 1000.0 * self._wait_time / self._dispatched if self._dispatched else 0.0,
+        }
+
+
+def _concat_results(results: List[Tuple[torch.Tensor, torch.Tensor]]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Join the per-chunk (logits, embeddings) of a request that was split across batches"""
+    logits, embeddings = zip(*results)
+    return torch.cat(logits), torch.cat(embeddings)
@@ -0,0 +1,353 @@
+import io
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional, Union
+
+import numpy as np
+import soundfile as sf
+
+from services.admission import OverloadedError
+
+# WAVE format tags
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Sanity bounds for declared header values
+MAX_SAMPLE_RATE = 768000
+MAX_CHANNELS = 64
+
+# Bytes from the end of ffmpeg's error log quoted in a decode error
+_FFMPEG_ERROR_TAIL = 4096
+
+# (format tag, bits per sample) -> stored sample dtype; 24-bit PCM is unpacked by hand
+_WAV_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype("u1"),
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_PCM, 24): np.dtype("u1"),
+    (WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype("<f8"),
+}
+
+
+class AudioFormatError(ValueError):
+    """The upload is malformed, unsupported or exceeds the configured limits"""
+
+
+@dataclass(frozen=True)
+class AudioInfo:
+    """Stream parameters declared by the file header"""
+    format: str
+    sample_rate: int
+    channels: int
+    # Unknown until decoded for the ffmpeg path
+    frames: Optional[int]
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.frames is None else self.frames / self.sample_rate
+
+
+@dataclass
+class DecodedAudio:
+    """Header info plus a lazy iterator of (frames, channels) float32 blocks at the native rate"""
+    info: AudioInfo
+    blocks: Iterator[np.ndarray]
+
+
+@dataclass(frozen=True)
+class _WavLayout:
+    info: AudioInfo
+    format_tag: int
+    bits: int
+    data_offset: int
+    data_size: int
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """Container format from the first bytes of a file"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:3] == b"ID3" or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+def read_wav_header(buffer: BinaryIO) -> Optional[_WavLayout]:
+    """
+    Parse the RIFF chunks of a WAV file up to the start of its sample data.
+    Returns None for encodings without a direct PCM path (ADPCM, mu-law, ...),
+    raises AudioFormatError if the header is malformed.
+    """
+    end = buffer.seek(0, io.SEEK_END)
+    buffer.seek(0)
+    if buffer.read(12)[8:12] != b"WAVE":
+        raise AudioFormatError("Not a RIFF/WAVE file")
+
+    fmt = None
+    while True:
+        chunk = buffer.read(8)
+        if len(chunk) < 8:
+            raise AudioFormatError("WAV file has no data chunk")
+        chunk_id, size = struct.unpack("<4sI", chunk)
+
+        if chunk_id == b"fmt ":
+            body = buffer.read(size)
+            if len(body) < 16:
+                raise AudioFormatError("WAV fmt chunk is truncated")
+            format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                format_tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (format_tag, channels, sample_rate, block_align, bits)
+            if size & 1:
+                buffer.seek(1, io.SEEK_CUR)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioFormatError("WAV data chunk precedes its fmt chunk")
+            data_offset = buffer.tell()
+            # Streamed WAVs may declare 0 or 0xFFFFFFFF; trust the file length instead
+            if size == 0 or data_offset + size > end:
+                size = end - data_offset
+            break
+        else:
+            buffer.seek(size + (size & 1), io.SEEK_CUR)
+
+    format_tag, channels, sample_rate, block_align, bits = fmt
+    if not 0 < sample_rate <= MAX_SAMPLE_RATE or not 0 < channels <= MAX_CHANNELS:
+        raise AudioFormatError(f"Invalid WAV header: {sample_rate} Hz, {channels} channels")
+    if (format_tag, bits) not in _WAV_DTYPES:
+        return None
+    if block_align != channels * bits // 8:
+        raise AudioFormatError("Invalid WAV header: block alignment does not match the sample format")
+
+    info = AudioInfo("wav", sample_rate, channels, size // block_align)
+    return _WavLayout(info, format_tag, bits, data_offset, info.frames * block_align)
+
+
+def _wav_to_float(block: np.ndarray, layout: _WavLayout) -> np.ndarray:
+    """Scale stored samples to float32 in [-1, 1) the way libsndfile does"""
+    if layout.bits == 8:
+        return (block.astype(np.float32) - 128.0) / 128.0
+    if layout.bits == 24:
+        b = block.reshape(-1, 3).astype(np.int32)
+        packed = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8
+        return packed.astype(np.float32) / 2.0 ** 31
+    if layout.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return block.astype(np.float32)
+    return block.astype(np.float32) / float(2 ** (layout.bits - 1))
+
+
+def _fileno(buffer: BinaryIO) -> Optional[int]:
+    """File descriptor behind a buffer, or None for in-memory buffers"""
+    try:
+        return buffer.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+class AudioDecoder:
+    """
+    Format-aware decoding in front of librosa's generic loader.
+
+    The magic bytes pick the cheapest path: WAV sample data is parsed directly
+    (memory-mapped for large files on disk), other formats are read block by
+    block through libsndfile, and files libsndfile cannot open go to an ffmpeg
+    pipe when ffmpeg is installed. The declared duration and sample rate are
+    checked before any samples are decoded.
+    """
+
+    def __init__(
+        self,
+        max_duration: Optional[float] = None,
+        memmap_threshold: int = 8 * 1024 * 1024,
+        ffmpeg_processes: int = 2
+    ):
+        self.max_duration = max_duration
+        self.memmap_threshold = memmap_threshold
+        self.ffmpeg_path = shutil.which("ffmpeg") if ffmpeg_processes > 0 else None
+        # Bounds concurrent ffmpeg processes; each decodes one file then exits, and
+        # a file arriving while all are busy is shed with OverloadedError
+        self._ffmpeg_slots = threading.BoundedSemaphore(max(ffmpeg_processes, 1))
+
+    def check(self, info: AudioInfo) -> None:
+        """Reject headers that declare an empty or over-long recording"""
+        if info.frames is not None and info.frames == 0:
+            raise AudioFormatError("Audio contains no samples")
+        if self.max_duration is not None and info.duration is not None and info.duration > self.max_duration:
+            raise AudioFormatError(
+                f"Audio is {info.duration:.1f}s long, the limit is {self.max_duration:.0f}s"
+            )
+
+    def open(
+        self,
+        source: Union[str, os.PathLike, BinaryIO],
+        sr: int,
+        blocksize: int = 16000
+    ) -> Optional[DecodedAudio]:
+        """
+        Validate the header and return a lazy block decoder for `source`
+        (a path or a seekable buffer), or None when only librosa's fallback
+        chain can decode it
+        """
+        is_path = isinstance(source, (str, os.PathLike))
+        if is_path:
+            with open(source, "rb") as f:
+                header = f.read(12)
+        else:
+            source.seek(0)
+            header = source.read(12)
+            source.seek(0)
+
+        if sniff_format(header) == "wav":
+            decoded = self._open_wav(source, is_path, blocksize)
+            if decoded is not None:
+                return decoded
+
+        try:
+            audio_file = sf.SoundFile(source)
+        except sf.SoundFileRuntimeError:
+            if not is_path:
+                source.seek(0)
+            if self.ffmpeg_path is None:
+                return None
+            return self._open_ffmpeg(source, is_path, sr, blocksize)
+
+        info = AudioInfo(audio_file.format.lower(), audio_file.samplerate, audio_file.channels, audio_file.frames)
+        try:
+            self.check(info)
+        except AudioFormatError:
+            audio_file.close()
+            raise
+        return DecodedAudio(info, self._iter_soundfile(audio_file, blocksize))
+
+    def _open_wav(self, source, is_path: bool, blocksize: int) -> Optional[DecodedAudio]:
+        if is_path:
+            with open(source, "rb") as f:
+                layout = read_wav_header(f)
+        else:
+            layout = read_wav_header(source)
+            source.seek(0)
+        if layout is None:
+            return None
+        self.check(layout.info)
+
+        dtype = _WAV_DTYPES[(layout.format_tag, layout.bits)]
+        count = layout.data_size // dtype.itemsize
+        if is_path and layout.data_size >= self.memmap_threshold:
+            data = np.memmap(source, dtype=dtype, mode="r", offset=layout.data_offset, shape=(count,))
+        elif is_path:
+            data = np.fromfile(source, dtype=dtype, count=count, offset=layout.data_offset)
+        elif isinstance(source, io.BytesIO):
+            data = np.frombuffer(source.getbuffer(), dtype=dtype, count=count, offset=layout.data_offset)
+        elif _fileno(source) is not None:
+            # Spooled uploads and other real files are mapped rather than read back into memory
+            data = np.memmap(source, dtype=dtype, mode="r", offset=layout.data_offset, shape=(count,))
+        else:
+            source.seek(layout.data_offset)
+            data = np.frombuffer(source.read(layout.data_size), dtype=dtype, count=count)
+
+        return DecodedAudio(layout.info, self._iter_wav(data, layout, blocksize))
+
+    def _iter_wav(self, data: np.ndarray, layout: _WavLayout, blocksize: int) -> Iterator[np.ndarray]:
+        channels = layout.info.channels
+        # Stored values per frame (24-bit PCM is stored as 3 bytes per sample)
+        stride = channels * (3 if layout.bits == 24 else 1)
+        for start in range(0, layout.info.frames, blocksize):
+            block = data[start * stride:(start + blocksize) * stride]
+            yield _wav_to_float(block, layout).reshape(-1, channels)
+
+    def _iter_soundfile(self, audio_file: sf.SoundFile, blocksize: int) -> Iterator[np.ndarray]:
+        with audio_file:
+            for block in audio_file.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+                yield block
+
+    def _open_ffmpeg(self, source, is_path: bool, sr: int, blocksize: int) -> DecodedAudio:
+        # ffmpeg downmixes and resamples; the duration limit is enforced while decoding
+        info = AudioInfo("ffmpeg", sr, 1, None)
+        return DecodedAudio(info, self._iter_ffmpeg(source, is_path, sr, blocksize))
+
+    def _iter_ffmpeg(self, source, is_path: bool, sr: int, blocksize: int) -> Iterator[np.ndarray]:
+        command = [
+            self.ffmpeg_path, "-hide_banner", "-v", "error",
+            "-i", os.fspath(source) if is_path else "pipe:0",
+            "-f", "f32le", "-ac", "1", "-ar", str(sr), "pipe:1",
+        ]
+        max_frames = None if self.max_duration is None else int(self.max_duration * sr)
+
+        # The slot is held while this generator is suspended between blocks, and those
+        # blocks are pulled from shared worker threads; waiting for a slot here could
+        # block the very threads the holders need, so a busy pool sheds the request
+        if not self._ffmpeg_slots.acquire(blocking=False):
+            raise OverloadedError("Server busy: all ffmpeg decoders are in use", 1)
+
+        process = None
+        writer = None
+        # stderr goes to a file rather than a pipe: a corrupt input can log an error
+        # per packet, and a full, unread pipe would block ffmpeg and this thread
+        errors = None
+        try:
+            errors = tempfile.TemporaryFile()
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL if is_path else subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=errors
+            )
+            if not is_path:
+                # Feed stdin from a thread so a full stdout pipe cannot deadlock us
+                writer = threading.Thread(target=self._feed, args=(process, source), daemon=True)
+                writer.start()
+
+            decoded = 0
+            while True:
+                chunk = process.stdout.read(blocksize * 4)
+                if not chunk:
+                    break
+                block = np.frombuffer(chunk[:len(chunk) // 4 * 4], dtype="<f4")
+                decoded += len(block)
+                if max_frames is not None and decoded > max_frames:
+                    raise AudioFormatError(f"Audio is longer than the {self.max_duration:.0f}s limit")
+                yield block.reshape(-1, 1)
+
+            if process.wait() != 0:
+                # The last few lines are enough to say what went wrong
+                errors.seek(max(errors.seek(0, io.SEEK_END) - _FFMPEG_ERROR_TAIL, 0))
+                message = errors.read().decode(errors="replace").strip()
+                raise AudioFormatError(f"ffmpeg could not decode the audio: {message}")
+        finally:
+            # Also runs on GeneratorExit, when a consumer abandons the stream part-way
+            try:
+                if process is not None and process.poll() is None:
+                    process.kill()
+                    process.wait()
+                if writer is not None:
+                    writer.join()
+                if process is not None:
+                    process.stdout.close()
+                if errors is not None:
+                    errors.close()
+            finally:
+                self._ffmpeg_slots.release()
+
+    @staticmethod
+    def _feed(process: subprocess.Popen, buffer: BinaryIO) -> None:
+        try:
+            shutil.copyfileobj(buffer, process.stdin)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
@@ -0,0 +1,364 @@
+import threading
+import numpy as np
+import librosa
+import torch
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Segments normalised and resized per block; bounds the intermediate buffers
+_RESIZE_BLOCK_SIZE = 128
+
+# Bicubic kernel coefficient used by OpenCV's INTER_CUBIC
+_CUBIC_A = -0.75
+
+# Segments per STFT block; sizes the per-thread frame/spectrum scratch buffers
+_STFT_BLOCK_SIZE = 32
+
+# Frames per block when computing the STFT of a whole recording
+_STFT_FRAME_BLOCK_SIZE = 2048
+
+
+class _Workspace(threading.local):
+    """
+    Per-thread scratch arrays for the STFT, dB and resize intermediates. Each
+    named buffer grows to the largest shape requested and is then reused, so
+    repeated extraction on a preprocessing thread stops allocating.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.float32) -> np.ndarray:
+        size = int(np.prod(shape))
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = np.empty(size, dtype=dtype)
+            self.buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+
+
+_workspace = _Workspace()
+
+
+@lru_cache(maxsize=16)
+def get_mel_kernels(sr: int, n_fft: int, n_mels: int, win_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the cached (window, mel filterbank) pair used by librosa.feature.melspectrogram"""
+    window = librosa.filters.get_window("hann", win_length, fftbins=True)
+    window = librosa.util.pad_center(window, size=n_fft).astype(np.float32)
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+
+    # Shared between engines, so guard against accidental in-place edits
+    window.setflags(write=False)
+    mel_basis.setflags(write=False)
+    return window, mel_basis
+
+
+@lru_cache(maxsize=16)
+def cubic_resize_matrix(in_size: int, out_size: int) -> np.ndarray:
+    """
+    (out_size, in_size) operator equal to cv2.resize(..., INTER_CUBIC) along one
+    axis: same pixel-centre mapping, a=-0.75 kernel and replicated borders.
+    A 2-D resize is then `rows @ image @ cols.T`.
+    """
+    scale = in_size / out_size
+    position = ((np.arange(out_size) + 0.5) * scale - 0.5).astype(np.float32)
+    left = np.floor(position).astype(np.intp)
+    x = (position - left).astype(np.float64)
+
+    a = _CUBIC_A
+    weights = np.empty((out_size, 4))
+    weights[:, 0] = ((a * (x + 1) - 5 * a) * (x + 1) + 8 * a) * (x + 1) - 4 * a
+    weights[:, 1] = ((a + 2) * x - (a + 3)) * x * x + 1
+    weights[:, 2] = ((a + 2) * (1 - x) - (a + 3)) * (1 - x) * (1 - x) + 1
+    weights[:, 3] = 1 - weights[:, 0] - weights[:, 1] - weights[:, 2]
+
+    taps = np.clip(left[:, None] + np.arange(-1, 3), 0, in_size - 1)
+    matrix = np.zeros((out_size, in_size))
+    np.add.at(matrix, (np.repeat(np.arange(out_size), 4), taps.ravel()), weights.ravel())
+
+    matrix = matrix.astype(np.float32)
+    matrix.setflags(write=False)
+    return matrix
+
+
+class MelSpectrogramEngine:
+    """
+    Batched mel-spectrogram feature extraction.
+
+    Takes a (num_segments, samples) matrix and produces the (N, 1, d_shape, d_shape)
+    model input in a handful of vectorized operations. The result matches
+    AudioProcessor.audio_to_melspectrogram applied segment by segment to within
+    1e-4 absolute on the normalized [0, 1] images (float32 FFT rounding).
+    """
+
+    def __init__(
+        self,
+        sr: int = 16000,
+        n_fft: int = 1024,
+        hop_length: int = 256,
+        win_length: int = 1024,
+        n_mels: int = 64,
+        d_shape: int = 64
+    ):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.win_length = win_length
+        self.n_mels = n_mels
+        self.d_shape = d_shape
+        self.window, self.mel_basis = get_mel_kernels(sr, n_fft, n_mels, win_length)
+
+    def _frames_to_mel(self, frames: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Windowed rfft of (..., frames, n_fft) and mel projection into `out` (..., n_mels, frames)"""
+        # numpy's FFT runs in double precision anyway (float32 input is cast to a hidden
+        # temporary), so window and transform straight into float64 scratch
+        windowed = np.multiply(frames, self.window, out=_workspace.get("windowed", frames.shape, np.float64))
+        spectrum = np.fft.rfft(
+            windowed, axis=-1,
+            out=_workspace.get("spectrum", frames.shape[:-1] + (self.n_fft // 2 + 1,), np.complex128)
+        )
+        power = np.multiply(spectrum.real, spectrum.real, out=_workspace.get("power", spectrum.shape))
+        power += np.multiply(spectrum.imag, spectrum.imag, out=_workspace.get("power_imag", spectrum.shape))
+        return np.matmul(self.mel_basis, np.swapaxes(power, -1, -2), out=out)
+
+    def power_mel(self, segments: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Mel power spectrogram of every segment, shape (N, n_mels, frames), written into `out` when given"""
+        segments = np.asarray(segments, dtype=np.float32)
+        num_segments, num_samples = segments.shape
+        num_frames = 1 + num_samples // self.hop_length
+
+        mel_power = out if out is not None else np.empty((num_segments, self.n_mels, num_frames), dtype=np.float32)
+        pad = self.n_fft // 2
+
+        for start in range(0, num_segments, _STFT_BLOCK_SIZE):
+            block = segments[start:start + _STFT_BLOCK_SIZE]
+
+            # Centered, zero-padded frames as librosa.stft(center=True, pad_mode="constant")
+            padded = _workspace.get("padded", (len(block), num_samples + 2 * pad))
+            padded[:, :pad] = 0.0
+            padded[:, pad:pad + num_samples] = block
+            padded[:, pad + num_samples:] = 0.0
+            frames = np.lib.stride_tricks.sliding_window_view(padded, self.n_fft, axis=-1)
+            frames = frames[:, ::self.hop_length][:, :num_frames]
+
+            self._frames_to_mel(frames, out=mel_power[start:start + len(block)])
+
+        return mel_power
+
+    def whole_power_mel(self, y: np.ndarray) -> np.ndarray:
+        """Mel power spectrogram of a whole recording, shape (n_mels, frames)"""
+        return self.frame_range_power_mel(y, 0, 1 + len(y) // self.hop_length)
+
+    def frame_range_power_mel(
+        self, 
+        y: np.ndarray, 
+        first_frame: int, 
+        num_frames: int, 
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Frames [first_frame, first_frame + num_frames) of the whole-recording mel
+        power spectrogram, shape (n_mels, num_frames), written into `out` when
+        given. Only the samples those frames cover are read, with zero padding
+        past either end of `y`.
+        """
+        pad = self.n_fft // 2
+        lo = first_frame * self.hop_length - pad
+        hi = (first_frame + num_frames - 1) * self.hop_length + pad
+
+        excerpt = _workspace.get("excerpt", (hi - lo,))
+        head = max(-lo, 0)
+        body = y[max(lo, 0):min(hi, len(y))]
+        excerpt[:head] = 0.0
+        excerpt[head:head + len(body)] = body
+        excerpt[head + len(body):] = 0.0
+        frames = np.lib.stride_tricks.sliding_window_view(excerpt, self.n_fft)
+        frames = frames[::self.hop_length][:num_frames]
+
+        mel_power = out if out is not None else np.empty((self.n_mels, num_frames), dtype=np.float32)
+        for start in range(0, num_frames, _STFT_FRAME_BLOCK_SIZE):
+            block = frames[start:start + _STFT_FRAME_BLOCK_SIZE]
+            # matmul only uses BLAS for a contiguous output, so project into scratch and copy the columns
+            block_mel = self._frames_to_mel(block, out=_workspace.get("block_mel", (self.n_mels, len(block))))
+            mel_power[:, start:start + len(block)] = block_mel
+
+        return mel_power
+
+    def _to_db(self, mel_power: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Elementwise part of librosa.amplitude_to_db (ref=1.0, amin=1e-5), in place when `out` is `mel_power`"""
+        db = np.maximum(mel_power, 1e-5, out=out)
+        np.log10(db, out=db)
+        db *= 20.0
+        return db
+
+    def _normalise_and_resize(
+        self, 
+        log_spec: np.ndarray, 
+        out: Optional[np.ndarray] = None, 
+        index: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Per-segment top_db clipping, min/max normalisation and resize of a
+        (N, n_mels, frames) dB array, or of the rows of it selected by `index`.
+        Without an `index` the dB array is normalised in place.
+        """
+        num_segments = len(log_spec) if index is None else len(index)
+        images = out if out is not None else np.empty(
+            (num_segments, 1, self.d_shape, self.d_shape), dtype=np.float32
+        )
+
+        if num_segments == 0:
+            return images
+
+        # Resize as rows @ spectrogram @ cols.T, skipping an axis whose size already matches
+        num_frames = log_spec.shape[2]
+        rows = None if self.n_mels == self.d_shape else cubic_resize_matrix(self.n_mels, self.d_shape)
+        cols_t = None if num_frames == self.d_shape else cubic_resize_matrix(num_frames, self.d_shape).T
+
+        for start in range(0, num_segments, _RESIZE_BLOCK_SIZE):
+            stop = min(start + _RESIZE_BLOCK_SIZE, num_segments)
+            if index is None:
+                block = log_spec[start:stop]
+            else:
+                # Overlapping windows of a shared spectrogram, gathered into scratch
+                block = _workspace.get("gathered", (stop - start,) + log_spec.shape[1:])
+                for row, window in enumerate(index[start:stop]):
+                    block[row] = log_spec[window]
+
+            # amplitude_to_db's top_db=80 floor, applied per segment
+            seg_max = block.max(axis=(1, 2), keepdims=True)
+            np.maximum(block, seg_max - 80.0, out=block)
+
+            # Normalize each segment to [0, 1]
+            seg_min = block.min(axis=(1, 2), keepdims=True)
+            block -= seg_min
+            # A constant spectrogram (digital silence) normalises to zeros rather than NaN
+            value_range = seg_max - seg_min
+            value_range[value_range == 0] = 1.0
+            block /= value_range
+
+            # Bicubic resize of every segment in two batched matmuls
+            target = images[start:stop, 0]
+            if cols_t is not None:
+                block = np.matmul(
+                    block, cols_t,
+                    out=_workspace.get("resized", block.shape[:2] + (self.d_shape,)) if rows is not None else target
+                )
+            if rows is not None:
+                np.matmul(rows, block, out=target)
+            elif cols_t is None:
+                target[...] = block
+
+        return images
+
+    def to_images(self, mel_power: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Per-segment dB conversion, min/max normalisation and resize to (N, 1, d_shape, d_shape).
+        Writes into `out` when given instead of allocating a new array.
+        """
+        return self._normalise_and_resize(self._to_db(mel_power), out=out)
+
+    def shared_images(
+        self, 
+        y: np.ndarray, 
+        segment_starts: np.ndarray, 
+        samples_per_segment: int, 
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Shared-STFT mode: compute one mel spectrogram per frame grid and slice
+        each segment's frame window out of it, so overlapping segments reuse
+        frames instead of recomputing them. Segments share a grid when their
+        starts differ by a multiple of hop_length; a grid is only used where
+        that costs fewer frames than featurising its segments on their own.
+        The frames whose window crosses a segment edge are recomputed with the
+        segment zero-padded, so the images match per-segment extraction to the
+        same 1e-4 tolerance.
+        """
+        num_segments = len(segment_starts)
+        frames_per_segment = 1 + samples_per_segment // self.hop_length
+        mel_power = _workspace.get("mel", (num_segments, self.n_mels, frames_per_segment))
+        if num_segments == 0:
+            return self._normalise_and_resize(mel_power, out=out)
+
+        starts = np.asarray(segment_starts, dtype=np.intp)
+        offsets = starts % self.hop_length
+        alone = []
+        for offset in np.unique(offsets):
+            group = np.flatnonzero(offsets == offset)
+            # Only the frames these segments cover, so a subset of segments costs a subset of the STFT
+            frame_starts = (starts[group] - offset) // self.hop_length
+            first_frame = int(frame_starts.min())
+            num_frames = int(frame_starts.max()) - first_frame + frames_per_segment
+            if num_frames >= len(group) * frames_per_segment:
+                alone.append(group)
+                continue
+
+            # Interior frames never reach before the grid's offset, so the grid can start there
+            shared = self.frame_range_power_mel(
+                y[offset:], first_frame, num_frames, out=_workspace.get("shared_mel", (self.n_mels, num_frames))
+            )
+            # (num_windows, n_mels, frames_per_segment) view over the shared spectrogram
+            windows = np.lib.stride_tricks.sliding_window_view(shared, frames_per_segment, axis=1)
+            mel_power[group] = windows.transpose(1, 0, 2)[frame_starts - first_frame]
+
+            # Frames reaching past either segment edge see zero padding, not the neighbouring audio
+            edges = self._edge_frames(samples_per_segment)
+            frames = self._segment_frames(y, starts[group], samples_per_segment, edges)
+            edge_mel = self._frames_to_mel(
+                frames, out=_workspace.get("edge_mel", (len(group), self.n_mels, len(edges)))
+            )
+            mel_power[np.ix_(group, np.arange(self.n_mels), edges)] = edge_mel
+
+        if alone:
+            alone = np.concatenate(alone)
+            mel_power[alone] = self.power_mel(self._segment_frames(y, starts[alone], samples_per_segment))
+
+        return self._normalise_and_resize(self._to_db(mel_power, out=mel_power), out=out)
+
+    def _edge_frames(self, samples_per_segment: int) -> np.ndarray:
+        """Indices of a segment's frames whose centered window extends past its first or last sample"""
+        pad = self.n_fft // 2
+        frames = np.arange(1 + samples_per_segment // self.hop_length)
+        centers = frames * self.hop_length
+        return frames[(centers - pad < 0) | (centers + pad > samples_per_segment)]
+
+    def _segment_frames(
+        self,
+        y: np.ndarray,
+        starts: np.ndarray,
+        samples_per_segment: int,
+        frames: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        The given centered STFT frames of each segment, (N, len(frames), n_fft),
+        zero outside the segment. Without `frames`, the segments' samples
+        themselves, (N, samples_per_segment).
+        """
+        if frames is None:
+            if len(starts) and starts.max() + samples_per_segment <= len(y):
+                # Every segment lies inside the recording; gather rows of a strided view
+                return np.lib.stride_tricks.sliding_window_view(y, samples_per_segment)[starts]
+            offsets = np.arange(samples_per_segment)
+        else:
+            offsets = (frames * self.hop_length - self.n_fft // 2)[:, np.newaxis] + np.arange(self.n_fft)
+        positions = starts.reshape((-1,) + (1,) * offsets.ndim) + offsets
+        inside = (positions >= starts.reshape((-1,) + (1,) * offsets.ndim)) & (positions < len(y))
+        if frames is not None:
+            inside &= offsets < samples_per_segment
+        samples = np.asarray(y, dtype=np.float32)[np.clip(positions, 0, len(y) - 1)]
+        samples[~inside] = 0.0
+        return samples
+
+    def __call__(self, segments: np.ndarray, out: Optional[np.ndarray] = None) -> torch.Tensor:
+        """
+        Convert a (num_segments, samples) matrix into the model input tensor. With
+        `out` the images are written there and the tensor shares its memory;
+        intermediates live in per-thread scratch buffers.
+        """
+        num_segments, num_samples = np.shape(segments)
+        mel_power = self.power_mel(
+            segments, out=_workspace.get("mel", (num_segments, self.n_mels, 1 + num_samples // self.hop_length))
+        )
+        images = self._normalise_and_resize(self._to_db(mel_power, out=mel_power), out=out)
+        return torch.from_numpy(images)
@@ -0,0 +1,161 @@
+import hashlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import torch
+
+from core.config import Settings
+from models.ml_model import compile_model, load_model
+from models.quantization import load_quantized_model
+
+
+class InferenceBackend(ABC):
+    """
+    Model runtime used by MLService.
+
+    `load`, `infer` and `warmup` are blocking and always called from the
+    inference worker thread.
+    """
+
+    name = "base"
+
+    def __init__(self, settings: Settings, device: torch.device):
+        self.settings = settings
+        self.device = device
+        # Identifies the loaded artifact and runtime options (e.g. for cache keys)
+        self.version: Optional[str] = None
+
+    def _artifact_version(self, path: str, *options: str) -> str:
+        digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+        return ":".join((self.name, digest) + options)
+
+    @abstractmethod
+    def load(self) -> None:
+        """Load the model artifact"""
+
+    @abstractmethod
+    def is_loaded(self) -> bool:
+        """Whether `load` has completed"""
+
+    @abstractmethod
+    def infer(self, batch: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Score an (N, 1, d_shape, d_shape) batch, returning CPU (logits, embeddings)"""
+
+    def warmup(self, batch_sizes: Iterable[int]) -> None:
+        """Run representative batch sizes through the model"""
+        d_shape = self.settings.d_shape
+        for size in sorted(set(batch_sizes)):
+            batch = torch.zeros(size, 1, d_shape, d_shape)
+            # Twice: the first call may trigger compilation/profiling
+            self.infer(batch)
+            self.infer(batch)
+
+
+class TorchBackend(InferenceBackend):
+    """PyTorch runtime: eager, BatchNorm-fused, TorchScript, torch.compile or INT8"""
+
+    name = "torch"
+
+    def __init__(self, settings: Settings, device: torch.device, model_path: Optional[str] = None):
+        super().__init__(settings, device)
+        self.model_path = model_path or settings.model_path
+        self.model = None
+
+    def load(self) -> None:
+        if self.settings.model_precision == "int8":
+            # Already a frozen TorchScript graph
+            self.model = load_quantized_model(self.settings.quantized_model_path, self.device)
+            self.version = self._artifact_version(self.settings.quantized_model_path, "int8")
+            return
+
+        model = load_model(
+            self.model_path, self.device,
+            fuse=self.settings.fuse_batchnorm,
+            d_shape=self.settings.d_shape,
+            verify_batch_size=self.settings.batch_max_size
+        )
+        example = torch.zeros(1, 1, self.settings.d_shape, self.settings.d_shape, device=self.device)
+        self.model = compile_model(model, self.settings.inference_mode, example)
+        self.version = self._artifact_version(
+            self.model_path, "fp32", self.settings.inference_mode, f"fused={self.settings.fuse_batchnorm}"
+        )
+
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def _bucket_size(self, n: int) -> int:
+        """Smallest configured bucket that fits `n` segments"""
+        for size in sorted(self.settings.batch_buckets):
+            if size >= n:
+                return size
+        return n
+
+    def infer(self, batch: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        if self.settings.inference_mode == "eager":
+            with torch.no_grad():
+                outputs, embeddings = self.model(batch.to(self.device))
+            return outputs.cpu(), embeddings.cpu()
+
+        # Compiled graphs only see bucket shapes: split oversized batches, zero-pad the rest
+        largest = max(self.settings.batch_buckets)
+        logits, embeds = [], []
+        with torch.no_grad():
+            for chunk in torch.split(batch, largest):
+                n = len(chunk)
+                bucket = self._bucket_size(n)
+                if bucket > n:
+                    padding = chunk.new_zeros((bucket - n,) + tuple(chunk.shape[1:]))
+                    chunk = torch.cat([chunk, padding])
+                outputs, embeddings = self.model(chunk.to(self.device))
+                logits.append(outputs[:n].cpu())
+                embeds.append(embeddings[:n].cpu())
+        return torch.cat(logits), torch.cat(embeds)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime CPU runtime for a graph exported by scripts/export_onnx.py"""
+
+    name = "onnxruntime"
+
+    def __init__(self, settings: Settings, device: torch.device):
+        super().__init__(settings, device)
+        self.session = None
+
+    def load(self) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("INFERENCE_BACKEND=onnxruntime requires the onnxruntime package") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if self.settings.ort_intra_op_threads:
+            options.intra_op_num_threads = self.settings.ort_intra_op_threads
+        if self.settings.ort_inter_op_threads:
+            options.inter_op_num_threads = self.settings.ort_inter_op_threads
+
+        self.session = ort.InferenceSession(
+            self.settings.onnx_model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.version = self._artifact_version(self.settings.onnx_model_path)
+
+    def is_loaded(self) -> bool:
+        return self.session is not None
+
+    def infer(self, batch: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        inputs = batch.detach().cpu().contiguous().numpy()
+        logits, embeddings = self.session.run(["logits", "embeddings"], {"input": inputs})
+        return torch.from_numpy(logits), torch.from_numpy(embeddings)
+
+
+def create_backend(settings: Settings, device: torch.device, model_path: Optional[str] = None) -> InferenceBackend:
+    """Build the inference backend selected by settings.inference_backend"""
+    if settings.inference_backend == "torch":
+        return TorchBackend(settings, device, model_path)
+    if settings.inference_backend == "onnxruntime":
+        return OnnxRuntimeBackend(settings, device)
+    raise ValueError(f"Unknown inference backend: {settings.inference_backend}")
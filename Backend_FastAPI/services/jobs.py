@@ -0,0 +1,221 @@
+import asyncio
+import math
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.admission import OverloadedError
+
+# run() -> result of the job, awaited on a job worker
+JobFn = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class Job:
+    """A unit of background work and its outcome"""
+    id: str
+    owner: str
+    run: Optional[JobFn]
+    status: str = "queued"          # queued -> running -> completed | failed
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class JobQueue(ABC):
+    """Queue of job ids between the API and the job workers"""
+
+    name = "base"
+
+    @abstractmethod
+    async def put(self, job_id: str) -> None:
+        """Enqueue a job id, raising OverloadedError when the queue is full"""
+
+    @abstractmethod
+    async def get(self) -> str:
+        """Wait for the next job id"""
+
+    @abstractmethod
+    def qsize(self) -> int:
+        """Job ids waiting to be picked up"""
+
+    @abstractmethod
+    def full(self) -> bool:
+        """Whether put() would currently be rejected"""
+
+
+class InMemoryJobQueue(JobQueue):
+    """Bounded in-process queue; needs no broker, but jobs do not survive a restart"""
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+
+    def _ensure_queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    async def put(self, job_id: str) -> None:
+        try:
+            self._ensure_queue().put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise OverloadedError(f"Server busy: {self.max_size} jobs already queued", 1)
+
+    async def get(self) -> str:
+        return await self._ensure_queue().get()
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def full(self) -> bool:
+        return self.qsize() >= self.max_size
+
+
+def create_job_queue(kind: str = "memory", max_size: int = 64) -> JobQueue:
+    """Build the job queue selected by settings.job_queue"""
+    if kind == "memory":
+        return InMemoryJobQueue(max_size)
+    raise ValueError(f"Unknown job queue: {kind}")
+
+
+class JobManager:
+    """
+    Background job runner with status polling.
+
+    Submitted jobs are queued by id and executed by `workers` worker tasks,
+    so at most that many run at once however many are waiting. Job state is
+    kept in process until `result_ttl` seconds after the job finishes.
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 2, result_ttl: float = 3600.0):
+        self.queue = queue
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+        # Metrics
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._queue_time = 0.0
+        self._run_time = 0.0
+        self._latency = 0.0
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued and running jobs are marked failed"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        for job in self._jobs.values():
+            if job.status in ("queued", "running"):
+                self._finish(job, error="Server shut down before the job finished")
+
+    def check(self) -> None:
+        """Raise OverloadedError if a job submitted now would be rejected"""
+        if self.queue.full():
+            # Roughly how long until the workers have drained one job per worker
+            finished = self._completed + self._failed
+            run_time = self._run_time / finished if finished else 1.0
+            raise OverloadedError(
+                f"Server busy: {self.queue.qsize()} jobs already queued",
+                max(1, math.ceil(run_time))
+            )
+
+    async def submit(self, owner: str, run: JobFn) -> Job:
+        """Queue `run` as a new job of `owner`; raises OverloadedError when the queue is full"""
+        self._purge()
+        job = Job(uuid.uuid4().hex, owner, run)
+        self._jobs[job.id] = job
+        try:
+            await self.queue.put(job.id)
+        except Exception:
+            del self._jobs[job.id]
+            raise
+        self._submitted += 1
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        """A job by id, only if it belongs to `owner` when one is given"""
+        self._purge()
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._jobs.get(await self.queue.get())
+            if job is None or job.status != "queued":
+                continue
+
+            job.status = "running"
+            job.started_at = time.time()
+            self._running += 1
+            self._queue_time += job.started_at - job.submitted_at
+            try:
+                self._finish(job, result=await job.run())
+            except asyncio.CancelledError:
+                self._finish(job, error="Server shut down before the job finished")
+                raise
+            except Exception as e:
+                self._finish(job, error=str(e))
+            finally:
+                self._running -= 1
+
+    def _finish(self, job: Job, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job.finished_at = time.time()
+        # Release the job's input (e.g. the spooled upload) as soon as it is done
+        job.run = None
+        if error is None:
+            job.status, job.result = "completed", result
+            self._completed += 1
+        else:
+            job.status, job.error = "failed", error
+            self._failed += 1
+        self._latency += job.finished_at - job.submitted_at
+        if job.started_at is not None:
+            self._run_time += job.finished_at - job.started_at
+
+    def _purge(self) -> None:
+        """Forget finished jobs older than result_ttl"""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, throughput and latency counters"""
+        finished = self._completed + self._failed
+        started = finished + self._running
+        return {
+            "queue": self.queue.name,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "running": self._running,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "avg_queue_time": self._queue_time / started if started else 0.0,
+            "avg_run_time": self._run_time / finished if finished else 0.0,
+            "avg_latency": self._latency / finished if finished else 0.0,
+        }
@@ -0,0 +1,152 @@
+from contextlib import ExitStack
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+# Raw sample formats accepted from live clients: little-endian dtype and full-scale value
+PCM_ENCODINGS = {
+    "pcm_s16le": ("<i2", 32768.0),
+    "pcm_f32le": ("<f4", 1.0),
+}
+
+
+class LiveSegmenter:
+    """
+    Cuts a live sample stream into fixed-length (optionally overlapping)
+    windows as it arrives. Only the window being filled is kept, and the
+    windows are the same ones AudioProcessor.iter_segments cuts from the
+    complete recording.
+    """
+
+    __slots__ = ("samples_per_segment", "hop", "_window", "_filled", "_skip", "_fresh")
+
+    def __init__(self, samples_per_segment: int, hop: int):
+        self.samples_per_segment = samples_per_segment
+        self.hop = hop
+        self._window = np.empty(samples_per_segment, dtype=np.float32)
+        self._filled = 0
+        self._skip = 0   # samples still to discard when the hop is longer than a segment
+        self._fresh = 0  # samples received since the end of the last full window
+
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        """Append samples and return the windows they completed as a (num_windows, samples) matrix"""
+        windows = []
+        size = self.samples_per_segment
+        while len(samples):
+            if self._skip:
+                dropped = min(self._skip, len(samples))
+                self._skip -= dropped
+                samples = samples[dropped:]
+                continue
+
+            take = min(size - self._filled, len(samples))
+            self._window[self._filled:self._filled + take] = samples[:take]
+            self._filled += take
+            self._fresh += take
+            samples = samples[take:]
+
+            if self._filled == size:
+                windows.append(self._window.copy())
+                self._fresh = 0
+                if self.hop < size:
+                    # Keep the overlap for the next window
+                    self._window[:size - self.hop] = self._window[self.hop:]
+                    self._filled = size - self.hop
+                else:
+                    self._filled = 0
+                    self._skip = self.hop - size
+
+        if not windows:
+            return np.empty((0, size), dtype=np.float32)
+        return np.stack(windows)
+
+    def tail(self, mode: str = "drop") -> Optional[np.ndarray]:
+        """The audio after the last full window as a (1, samples) matrix, per AudioProcessor.segment_tail"""
+        if mode not in ("drop", "pad", "short"):
+            raise ValueError(f"Unknown segment tail mode: {mode}")
+        if mode == "drop" or self._fresh == 0 or self._skip or self._filled == 0:
+            return None
+
+        if mode == "pad":
+            padded = np.zeros((1, self.samples_per_segment), dtype=np.float32)
+            padded[0, :self._filled] = self._window[:self._filled]
+            return padded
+        return self._window[np.newaxis, :self._filled].copy()
+
+
+class LiveSession:
+    """
+    Per-connection state of a live stream: the PCM decoder carry, an optional
+    resampler stream, the segmenter's single window and a running prediction
+    accumulator. Nothing grows with the length of the session.
+    """
+
+    __slots__ = (
+        "segmenter", "accumulator", "sample_rate", "next_index", "samples",
+        "_dtype", "_scale", "_carry", "_resample", "_resources"
+    )
+
+    def __init__(
+        self,
+        segmenter: LiveSegmenter,
+        accumulator: Any,
+        sample_rate: int,
+        encoding: str = "pcm_s16le",
+        resample=None,
+        resources: Optional[ExitStack] = None
+    ):
+        if encoding not in PCM_ENCODINGS:
+            raise ValueError(f"Unsupported encoding: {encoding}. Supported: {list(PCM_ENCODINGS)}")
+        self.segmenter = segmenter
+        # PredictionAccumulator of the segments scored so far
+        self.accumulator = accumulator
+        # Rate of the samples after resampling
+        self.sample_rate = sample_rate
+        # Recording-wide index of the next window
+        self.next_index = 0
+        self.samples = 0
+        dtype, self._scale = PCM_ENCODINGS[encoding]
+        self._dtype = np.dtype(dtype)
+        self._carry = b""
+        self._resample = resample
+        self._resources = resources
+
+    @property
+    def duration(self) -> float:
+        """Seconds of audio received so far"""
+        return self.samples / self.sample_rate
+
+    def _decode(self, data: bytes) -> np.ndarray:
+        if self._carry:
+            data = self._carry + data
+        usable = len(data) - len(data) % self._dtype.itemsize
+        # A sample split across messages is completed by the next one
+        self._carry = data[usable:]
+
+        samples = np.frombuffer(data, dtype=self._dtype, count=usable // self._dtype.itemsize).astype(np.float32)
+        if self._scale != 1.0:
+            samples /= self._scale
+        return samples
+
+    def push(self, data: bytes) -> np.ndarray:
+        """Feed raw PCM bytes and return the windows they completed"""
+        samples = self._decode(data)
+        if self._resample is not None:
+            samples = self._resample(samples)
+        self.samples += len(samples)
+        return self.segmenter.push(samples)
+
+    def finish(self, tail: str = "drop") -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Flush the resampler at the end of the stream: the last full windows and the kept tail, if any"""
+        windows = np.empty((0, self.segmenter.samples_per_segment), dtype=np.float32)
+        if self._resample is not None:
+            samples = self._resample(np.empty(0, dtype=np.float32), last=True)
+            self.samples += len(samples)
+            windows = self.segmenter.push(samples)
+        return windows, self.segmenter.tail(tail)
+
+    def close(self) -> None:
+        """Return the resampler stream to its pool"""
+        if self._resources is not None:
+            self._resources.close()
+            self._resources = None
@@ -1,96 +1,698 @@
 import os
+import json
+import hashlib
 import numpy as np
 import torch
 import asyncio
-from typing import Dict, List, Any
+from contextlib import ExitStack
+from typing import AsyncIterator, Dict, List, Any, Optional
 from pathlib import Path
 
-from models.ml_model import load_model
-from services.audio_processing import AudioProcessor
+from core.config import Settings, get_settings
+from services.admission import AdmissionController, OverloadedError
+from services.audio_processing import AudioProcessor, AudioSource, FeatureChunk
+from services.batching import MicroBatcher
+from services.decoders import AudioFormatError
+from services.inference_backends import InferenceBackend, create_backend
+from services.live_inference import LiveSegmenter, LiveSession
+from services.pipeline import PipelineStage
+from services.process_pool import PreprocessPool
+from services.prediction_cache import PredictionCache
+from services.tensor_arena import TensorArena
+from services.voice_activity import EnergyVAD
+
+# Settings that change the prediction for identical audio
+PREPROCESSING_KEYS = (
+    "sample_rate", "n_fft", "hop_length", "win_length", "n_mels", "d_shape",
+    "segment_length", "segment_hop", "segment_tail", "stft_mode", "class_labels",
+    "resampler", "resampler_quality", "vad_mode", "vad_energy_threshold_db", "vad_max_zcr",
+    "vad_min_speech_fraction",
+)
+
+def _close_generator(generator) -> None:
+    """
+    Close a chunk generator now rather than whenever it is collected, so an
+    abandoned stream releases its decoder (an ffmpeg process and its slot)
+    and arena buffers at once
+    """
+    try:
+        generator.close()
+    except ValueError:
+        # Still running on a stage thread whose job was abandoned; that job
+        # drops the last reference, which closes it, when it finishes
+        pass
+
+class PredictionAccumulator:
+    """
+    Running aggregate of per-segment predictions: class vote counts and
+    probability sums over speech segments, plus the per-segment entries of
+    the response
+    """
+    
+    def __init__(self, class_labels: List[str], flag_speech: bool = False, keep_segments: bool = True):
+        self.class_labels = class_labels
+        # Whether segment entries carry the VAD decision ("flag" mode)
+        self.flag_speech = flag_speech
+        # Streaming callers hand each chunk's entries out instead of collecting them
+        self.keep_segments = keep_segments
+        self.class_counts = np.zeros(len(class_labels), dtype=np.int64)
+        self.probability_sums = np.zeros(len(class_labels), dtype=np.float64)
+        self.segment_predictions: List[Dict[str, Any]] = []
+        self.total_segments = 0
+        self.skipped_segments = 0
+    
+    def add(self, outputs: torch.Tensor, chunk: FeatureChunk) -> List[Dict[str, Any]]:
+        """Fold a chunk's per-segment logits in, returning that chunk's segment entries"""
+        self.skipped_segments += chunk.skipped
+        if len(outputs) == 0:
+            return []
+        
+        with torch.no_grad():
+            probabilities = torch.nn.functional.softmax(outputs, dim=1)
+            _, predictions = torch.max(outputs, 1)
+            
+            # Convert to numpy
+            predictions = predictions.cpu().numpy()
+            probs = probabilities.cpu().numpy()
+        
+        # Only speech segments count towards the overall prediction
+        speech = chunk.speech
+        self.class_counts += np.bincount(predictions[speech], minlength=len(self.class_labels))
+        self.probability_sums += probs[speech].sum(axis=0, dtype=np.float64)
+        self.total_segments += int(np.count_nonzero(speech))
+        self.skipped_segments += int(np.count_nonzero(~speech))
+        
+        # Create segment predictions
+        entries = []
+        for index, pred, prob, is_speech in zip(chunk.segment_index, predictions, probs, speech):
+            entry = {
+                'segment': int(index),
+                'predicted_class': int(pred),
+                'class_label': self.class_labels[int(pred)],
+                'probabilities': {
+                    self.class_labels[j]: float(p) 
+                    for j, p in enumerate(prob)
+                }
+            }
+            if self.flag_speech:
+                entry['speech'] = bool(is_speech)
+            entries.append(entry)
+        if self.keep_segments:
+            self.segment_predictions.extend(entries)
+        return entries
+    
+    def estimate(self) -> Optional[Dict[str, Any]]:
+        """The running summary, or None before any speech segment has been scored"""
+        return self.summary() if self.total_segments else None
+    
+    def summary(self) -> Dict[str, Any]:
+        """Overall prediction and average probabilities over the segments seen so far"""
+        if self.total_segments == 0:
+            if self.skipped_segments:
+                raise AudioFormatError("No speech detected in the recording")
+            raise ValueError("Audio is shorter than one segment")
+        
+        most_common_class = int(self.class_counts.argmax())
+        avg_probabilities = (self.probability_sums / self.total_segments).tolist()
+        confidence = avg_probabilities[most_common_class]
+        
+        return {
+            'overall_prediction': {
+                'predicted_class': most_common_class,
+                'confidence': float(confidence),
+                'class_label': self.class_labels[most_common_class]
+            },
+            'average_probabilities': {
+                self.class_labels[i]: float(p) 
+                for i, p in enumerate(avg_probabilities)
+            },
+            'total_segments': self.total_segments,
+            'skipped_segments': self.skipped_segments
+        }
+    
+    def result(self) -> Dict[str, Any]:
+        """The full prediction response"""
+        summary = self.summary()
+        return {
+            'overall_prediction': summary['overall_prediction'],
+            'average_probabilities': summary['average_probabilities'],
+            'segment_predictions': self.segment_predictions,
+            'total_segments': summary['total_segments'],
+            'skipped_segments': summary['skipped_segments']
+        }
+
 
 class MLService:
     """Service for ML model operations"""
     
-    def __init__(self, model_path: str, device: torch.device):
+    def __init__(self, model_path: str, device: torch.device, settings: Optional[Settings] = None):
         self.model_path = model_path
         self.device = device
-        self.model = None
-        self.audio_processor = AudioProcessor()
+        self.settings = settings or get_settings()
+        self.backend: InferenceBackend = create_backend(self.settings, device, model_path)
+        self.warmed_up = False
+        # Why warm-up failed, if it did; the instance then never becomes ready
+        self.warmup_error: Optional[str] = None
+        self.admission = AdmissionController(
+            max_concurrency=self.settings.max_concurrent_predictions,
+            max_queue=self.settings.max_queued_predictions,
+            latency_budget=self.settings.queue_latency_budget
+        )
+        self.batcher: Optional[MicroBatcher] = None
+        self.live_sessions = 0
+        self.cache: Optional[PredictionCache] = None
+        if self.settings.prediction_cache_enabled:
+            self.cache = PredictionCache(
+                max_entries=self.settings.prediction_cache_size,
+                ttl_seconds=self.settings.prediction_cache_ttl
+            )
+        processor_kwargs = {
+            "temp_dir": self.settings.decode_temp_dir,
+            "max_duration": self.settings.max_audio_duration,
+            "memmap_threshold": self.settings.wav_memmap_threshold,
+            "ffmpeg_processes": self.settings.ffmpeg_processes,
+            "resampler": self.settings.resampler,
+            "resampler_quality": self.settings.resampler_quality
+        }
+        self.audio_processor = AudioProcessor(**processor_kwargs)
+        
+        # Reusable feature/batch buffers per segment-count bucket
+        self.arena: Optional[TensorArena] = None
+        if self.settings.arena_enabled:
+            self.arena = TensorArena(
+                self.settings.batch_buckets + [self.settings.batch_max_size, self.settings.inference_chunk_size],
+                max_buffers_per_bucket=self.settings.arena_buffers_per_bucket,
+                max_bytes=self.settings.arena_max_bytes
+            )
+        
+        # Decode/featurisation and torch inference run on separate bounded stages, so
+        # preprocessing of one request overlaps inference of another and the event
+        # loop never executes torch code
+        self.preprocess_stage = PipelineStage(
+            "preprocess",
+            workers=self.settings.preprocess_workers,
+            max_in_flight=self.settings.preprocess_queue_size
+        )
+        self.inference_stage = PipelineStage(
+            "inference",
+            workers=1,
+            max_in_flight=self.settings.inference_queue_size
+        )
+        
+        # Decoding and featurisation move to worker processes when configured; the
+        # preprocessing threads then only hash uploads and fold results together
+        self.preprocess_pool: Optional[PreprocessPool] = None
+        if self.settings.preprocess_processes > 0:
+            self.preprocess_pool = PreprocessPool(
+                self.settings.preprocess_processes,
+                max_in_flight=self.settings.preprocess_queue_size,
+                processor_kwargs=processor_kwargs,
+                feature_kwargs=self._feature_kwargs(self.settings),
+                chunk_size=self.settings.inference_chunk_size,
+                threads_per_process=self.settings.preprocess_threads_per_process,
+                arena_kwargs={
+                    "max_buffers_per_bucket": self.settings.arena_buffers_per_bucket,
+                    "max_bytes": self.settings.arena_max_bytes,
+                }
+            )
         
     async def load_model(self) -> None:
         """Load the trained model asynchronously"""
-        loop = asyncio.get_event_loop()
-        self.model = await loop.run_in_executor(None, load_model, self.model_path, self.device)
+        await self.inference_stage.run(self.backend.load)
+        if self.preprocess_pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.preprocess_pool.start)
+        
+        # Share forward passes between concurrent requests
+        if self.settings.batching_enabled:
+            self.batcher = MicroBatcher(
+                self.backend.infer,
+                max_batch_size=self.settings.batch_max_size,
+                max_wait_ms=self.settings.batch_max_wait_ms,
+                run=self.inference_stage.run,
+                arena=self.arena
+            )
+            self.batcher.start()
+    
+    async def close(self) -> None:
+        """Stop background workers"""
+        if self.batcher is not None:
+            await self.batcher.stop()
+            self.batcher = None
+        if self.preprocess_pool is not None:
+            self.preprocess_pool.shutdown()
+        self.preprocess_stage.shutdown()
+        self.inference_stage.shutdown()
     
-    async def predict_audio(self, audio_file_path: str, settings) -> Dict[str, Any]:
+    async def warmup(self) -> None:
         """
-        Process audio file and return predictions
+        Run every bucket size through the model so the fast path is ready before
+        traffic. A failure is recorded in `warmup_error` and re-raised.
         """
-        if self.model is None:
-            raise RuntimeError("Model not loaded")
-        
         try:
-            # Process audio in thread pool
-            loop = asyncio.get_event_loop()
-            mel_specs = await loop.run_in_executor(
-                None, 
-                self.audio_processor.preprocess_audio,
-                audio_file_path,
+            await self.inference_stage.run(self.backend.warmup, self.settings.batch_buckets)
+        except Exception as e:
+            self.warmup_error = f"{type(e).__name__}: {e}"
+            raise
+        self.warmed_up = True
+    
+    @staticmethod
+    def _feature_kwargs(settings) -> Dict[str, Any]:
+        """Feature-extraction arguments of AudioProcessor.extract_features and iter_feature_chunks"""
+        return {
+            "sr": settings.sample_rate,
+            "n_fft": settings.n_fft,
+            "hop_length": settings.hop_length,
+            "win_length": settings.win_length,
+            "n_mels": settings.n_mels,
+            "d_shape": settings.d_shape,
+            "segment_length": settings.segment_length,
+            "segment_hop": settings.segment_hop,
+            "segment_tail": settings.segment_tail,
+            "stft_mode": settings.stft_mode
+        }
+    
+    def _chunk_kwargs(self, settings) -> Dict[str, Any]:
+        """Arguments of iter_feature_chunks (and PreprocessPool.open), including the VAD gate"""
+        vad = None
+        if settings.vad_mode != "off":
+            vad = EnergyVAD(
                 settings.sample_rate,
-                settings.n_fft,
-                settings.hop_length,
-                settings.win_length,
-                settings.n_mels,
-                settings.d_shape
+                energy_threshold_db=settings.vad_energy_threshold_db,
+                max_zcr=settings.vad_max_zcr,
+                min_speech_fraction=settings.vad_min_speech_fraction
             )
+        return dict(
+            self._feature_kwargs(settings),
+            chunk_size=settings.inference_chunk_size,
+            vad=vad,
+            drop_non_speech=settings.vad_mode == "drop"
+        )
+    
+    def _cache_key(self, content_digest, settings) -> str:
+        """Hash of the upload (a sha256 object fed its bytes), the loaded model and the preprocessing settings"""
+        preprocessing = json.dumps({key: getattr(settings, key) for key in PREPROCESSING_KEYS}, sort_keys=True)
+        digest = content_digest.copy()
+        digest.update(self.backend.version.encode())
+        digest.update(preprocessing.encode())
+        return digest.hexdigest()
+    
+    async def predict_audio(self, audio: AudioSource, settings, content_digest=None, shed: bool = True) -> Dict[str, Any]:
+        """
+        Process an audio file path or in-memory upload and return predictions.
+        Identical uploads are answered from the prediction cache, or wait on the
+        computation already in flight for them. Streamed uploads pass the sha256
+        of their bytes as `content_digest` so they can be cached without being
+        read twice. New computations go through admission control and raise
+        OverloadedError when the server is saturated, unless `shed` is False,
+        in which case they wait for a slot.
+        """
+        if not self.is_loaded():
+            raise RuntimeError("Model not loaded")
+        
+        if self.cache is None:
+            return await self._admitted_predict(audio, settings, shed)
+        if content_digest is None:
+            if not isinstance(audio, (bytes, bytearray, memoryview)):
+                return await self._admitted_predict(audio, settings, shed)
+            content_digest = await self.preprocess_stage.run(hashlib.sha256, audio)
+        
+        key = self._cache_key(content_digest, settings)
+        return await self.cache.get_or_compute(key, lambda: self._admitted_predict(audio, settings, shed))
+    
+    async def _admitted_predict(self, audio: AudioSource, settings, shed: bool = True) -> Dict[str, Any]:
+        """_predict once the admission controller grants a slot"""
+        async with self.admission.admit(shed):
+            return await self._predict(audio, settings)
+    
+    async def _predict(self, audio: AudioSource, settings) -> Dict[str, Any]:
+        """
+        Decode, featurise and score a recording in chunks of
+        settings.inference_chunk_size segments (see _score_chunks), keeping only
+        per-class totals plus the compact per-segment results, so memory does
+        not grow with recording length.
+        """
+        accumulator = PredictionAccumulator(settings.class_labels, flag_speech=settings.vad_mode == "flag")
+        async for _ in self._score_chunks(audio, settings, accumulator):
+            pass
+        try:
+            return accumulator.result()
+        except AudioFormatError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Audio processing failed: {str(e)}")
+    
+    async def _score_chunks(
+        self,
+        audio: AudioSource,
+        settings,
+        accumulator: PredictionAccumulator
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Fold a recording's chunks into `accumulator`, yielding each chunk's
+        segment entries as soon as it is scored. Chunks are produced while the
+        audio is still being decoded, and featurising the next chunk overlaps
+        inference of the current one. Feature buffers come from the tensor
+        arena and go back to it once their chunk has been scored and accumulated.
+        """
+        pending: Optional[asyncio.Future] = None
+        pending_chunk: Optional[FeatureChunk] = None
+        stream = None
+        chunks = None
+        try:
+            chunk_kwargs = self._chunk_kwargs(settings)
+            if self.preprocess_pool is not None:
+                stream = await self.preprocess_pool.open(audio, **chunk_kwargs)
+            else:
+                chunks = self.audio_processor.iter_feature_chunks(audio, arena=self.arena, **chunk_kwargs)
             
-            # Move to device and predict
-            mel_specs = mel_specs.to(self.device)
-            
-            with torch.no_grad():
-                outputs, _ = self.model(mel_specs)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)
-                _, predictions = torch.max(outputs, 1)
+            while True:
+                # Decode, gate and featurise the next chunk on a worker process or the preprocessing stage
+                if stream is not None:
+                    chunk = await self.preprocess_pool.next(stream)
+                else:
+                    chunk = await self.preprocess_stage.run(next, chunks, None)
                 
-                # Convert to numpy
-                predictions = predictions.cpu().numpy()
-                probs = probabilities.cpu().numpy()
-            
-            # Calculate results
-            most_common_class = np.bincount(predictions).argmax()
-            avg_probabilities = probs.mean(axis=0).tolist()
-            confidence = avg_probabilities[most_common_class]
-            
-            # Create segment predictions
-            segment_predictions = []
-            for i, (pred, prob) in enumerate(zip(predictions, probs)):
-                segment_predictions.append({
-                    'segment': i,
-                    'predicted_class': int(pred),
-                    'class_label': settings.class_labels[int(pred)],
-                    'probabilities': {
-                        settings.class_labels[j]: float(p) 
-                        for j, p in enumerate(prob)
-                    }
-                })
-            
-            return {
-                'overall_prediction': {
-                    'predicted_class': int(most_common_class),
-                    'confidence': float(confidence),
-                    'class_label': settings.class_labels[most_common_class]
-                },
-                'average_probabilities': {
-                    settings.class_labels[i]: float(p) 
-                    for i, p in enumerate(avg_probabilities)
-                },
-                'segment_predictions': segment_predictions,
-                'total_segments': len(predictions)
-            }
+                # Start scoring it before the previous chunk's results are handed out
+                scored, scored_chunk = pending, pending_chunk
+                pending = None
+                if chunk is not None and len(chunk.features):
+                    pending = asyncio.ensure_future(self._infer(chunk.features))
+                    pending_chunk = chunk
+                
+                if scored is not None:
+                    outputs, _ = await scored
+                    entries = await self.preprocess_stage.run(accumulator.add, outputs, scored_chunk)
+                    self._release(scored_chunk)
+                    yield entries
+                if chunk is None:
+                    break
+                if len(chunk.features) == 0:
+                    # Nothing but non-speech in this chunk
+                    entries = accumulator.add(chunk.features.new_empty((0, len(settings.class_labels))), chunk)
+                    self._release(chunk)
+                    yield entries
             
+        except (AudioFormatError, OverloadedError):
+            raise
         except Exception as e:
             raise RuntimeError(f"Audio processing failed: {str(e)}")
+        finally:
+            # A cancelled inference may still read its buffer, so that one is left to the GC
+            if pending is not None:
+                pending.cancel()
+            if stream is not None and not stream.done:
+                await self.preprocess_pool.close(stream)
+            if chunks is not None:
+                await self.preprocess_stage.run(_close_generator, chunks)
+    
+    async def predict_stream(
+        self,
+        audio: AudioSource,
+        settings,
+        content_digest=None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Predict on a recording, yielding events as it is scored instead of one
+        result at the end: a "segments" event per chunk with that chunk's
+        segment entries and the running estimate over every segment so far
+        (None until a speech segment has been scored), then a "summary" event
+        with the same overall fields as predict_audio minus the segment list.
+        Cached recordings are replayed from the cache as a single chunk. The
+        admission slot is held only while chunks are being scored, not while
+        an event waits to be read by the client.
+        """
+        if not self.is_loaded():
+            raise RuntimeError("Model not loaded")
+        
+        if self.cache is not None and content_digest is not None:
+            cached = self.cache.get(self._cache_key(content_digest, settings))
+            if cached is not None:
+                summary = {key: value for key, value in cached.items() if key != 'segment_predictions'}
+                yield {'event': 'segments', 'segments': cached['segment_predictions'], 'estimate': summary}
+                yield dict(summary, event='summary')
+                return
+        
+        accumulator = PredictionAccumulator(
+            settings.class_labels,
+            flag_speech=settings.vad_mode == "flag",
+            keep_segments=False
+        )
+        async with self.admission.admit() as slot:
+            async for entries in self._score_chunks(audio, settings, accumulator):
+                # Waiting on the client is not scoring work; let other requests
+                # have the slot until the event has been taken
+                async with slot.released():
+                    yield {'event': 'segments', 'segments': entries, 'estimate': accumulator.estimate()}
+        
+        try:
+            summary = accumulator.summary()
+        except AudioFormatError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Audio processing failed: {str(e)}")
+        yield dict(summary, event='summary')
+    
+    async def predict_batch(
+        self,
+        audios: List[AudioSource],
+        settings,
+        content_digests: Optional[List[Any]] = None
+    ) -> List[Any]:
+        """
+        Predict on several recordings with one shared forward pass.
+        
+        Recordings are featurised in parallel, the segments of all of them are
+        concatenated into a single inference call and the outputs are split
+        back per recording. Returns one entry per recording, in order: its
+        result dict, or the exception that recording failed with, so one bad
+        file does not fail the others. Cached recordings are answered from the
+        cache, and the batch as a whole takes one admission slot.
+        """
+        if not self.is_loaded():
+            raise RuntimeError("Model not loaded")
+        
+        results: List[Any] = [None] * len(audios)
+        keys: List[Optional[str]] = [None] * len(audios)
+        if self.cache is not None and content_digests is not None:
+            for i, digest in enumerate(content_digests):
+                keys[i] = self._cache_key(digest, settings)
+                results[i] = self.cache.get(keys[i])
+        
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            async with self.admission.admit():
+                computed = await self._predict_batch([audios[i] for i in misses], settings)
+            for i, result in zip(misses, computed):
+                results[i] = result
+                if keys[i] is not None and not isinstance(result, Exception):
+                    self.cache.put(keys[i], result)
+        return results
+    
+    async def _predict_batch(self, audios: List[AudioSource], settings) -> List[Any]:
+        """Featurise recordings concurrently, score all their segments together and split the results"""
+        chunk_kwargs = self._chunk_kwargs(settings)
+        featurised = await asyncio.gather(
+            *[self._featurise(audio, chunk_kwargs) for audio in audios],
+            return_exceptions=True
+        )
+        
+        buffer = None
+        try:
+            features = [
+                chunk.features
+                for chunks in featurised if not isinstance(chunks, BaseException)
+                for chunk in chunks if len(chunk.features)
+            ]
+            outputs = None
+            if features:
+                sizes = [len(chunk) for chunk in features]
+                if self.arena is not None and features[0].device.type == "cpu":
+                    buffer = self.arena.acquire(sum(sizes), tuple(features[0].shape[1:]))
+                    batch = torch.from_numpy(buffer[:sum(sizes)])
+                    await self.preprocess_stage.run(lambda: torch.cat(features, out=batch))
+                else:
+                    batch = await self.preprocess_stage.run(torch.cat, features)
+                logits, _ = await self._infer(batch)
+                outputs = iter(torch.split(logits, sizes))
+            
+            return await self.preprocess_stage.run(self._split_batch, featurised, outputs, settings)
+        finally:
+            if buffer is not None:
+                self.arena.release(buffer)
+            for chunks in featurised:
+                if not isinstance(chunks, BaseException):
+                    for chunk in chunks:
+                        self._release(chunk)
+    
+    @staticmethod
+    def _split_batch(featurised: List[Any], outputs, settings) -> List[Any]:
+        """Fold the shared pass's logits back into one result (or exception) per recording"""
+        results = []
+        for chunks in featurised:
+            if isinstance(chunks, BaseException):
+                results.append(chunks)
+                continue
+            accumulator = PredictionAccumulator(settings.class_labels, flag_speech=settings.vad_mode == "flag")
+            for chunk in chunks:
+                if len(chunk.features):
+                    accumulator.add(next(outputs), chunk)
+                else:
+                    # Nothing but non-speech in this chunk
+                    accumulator.add(chunk.features.new_empty((0, len(settings.class_labels))), chunk)
+            try:
+                results.append(accumulator.result())
+            except AudioFormatError as e:
+                results.append(e)
+            except Exception as e:
+                results.append(RuntimeError(f"Audio processing failed: {str(e)}"))
+        return results
+    
+    async def _featurise(self, audio: AudioSource, chunk_kwargs: Dict[str, Any]) -> List[FeatureChunk]:
+        """Decode and featurise a whole recording, keeping all of its chunks"""
+        chunks: List[FeatureChunk] = []
+        stream = None
+        iterator = None
+        try:
+            if self.preprocess_pool is not None:
+                stream = await self.preprocess_pool.open(audio, **chunk_kwargs)
+            else:
+                iterator = self.audio_processor.iter_feature_chunks(audio, arena=self.arena, **chunk_kwargs)
+            while True:
+                if stream is not None:
+                    chunk = await self.preprocess_pool.next(stream)
+                else:
+                    chunk = await self.preprocess_stage.run(next, iterator, None)
+                if chunk is None:
+                    return chunks
+                chunks.append(chunk)
+        except BaseException as e:
+            for chunk in chunks:
+                self._release(chunk)
+            if isinstance(e, Exception) and not isinstance(e, (AudioFormatError, OverloadedError)):
+                raise RuntimeError(f"Audio processing failed: {str(e)}")
+            raise
+        finally:
+            if stream is not None and not stream.done:
+                await self.preprocess_pool.close(stream)
+            if iterator is not None:
+                await self.preprocess_stage.run(_close_generator, iterator)
+    
+    def open_live_session(self, settings, sample_rate: int, encoding: str = "pcm_s16le") -> LiveSession:
+        """
+        Start a live stream of raw PCM at `sample_rate`, resampled to
+        settings.sample_rate when it differs. Raises OverloadedError when
+        settings.live_max_sessions streams are already open and ValueError for
+        an unsupported format; the session must be closed with close_live_session.
+        """
+        if self.live_sessions >= settings.live_max_sessions:
+            raise OverloadedError(f"Server busy: {self.live_sessions} live sessions already open", 1)
+        if sample_rate <= 0:
+            raise ValueError(f"Invalid sample rate: {sample_rate}")
+        
+        samples_per_segment = int(settings.segment_length * settings.sample_rate)
+        hop = int(settings.segment_hop * settings.sample_rate) if settings.segment_hop else samples_per_segment
+        accumulator = PredictionAccumulator(
+            settings.class_labels,
+            flag_speech=settings.vad_mode == "flag",
+            keep_segments=False
+        )
+        
+        resources = ExitStack()
+        resample = None
+        if sample_rate != settings.sample_rate:
+            resample = resources.enter_context(
+                self.audio_processor.resampler.stream(sample_rate, settings.sample_rate)
+            )
+        try:
+            session = LiveSession(
+                LiveSegmenter(samples_per_segment, hop),
+                accumulator,
+                settings.sample_rate,
+                encoding=encoding,
+                resample=resample,
+                resources=resources
+            )
+        except Exception:
+            resources.close()
+            raise
+        
+        self.live_sessions += 1
+        return session
+    
+    def close_live_session(self, session: LiveSession) -> None:
+        """Release a live session's resampler and its place under the session limit"""
+        session.close()
+        self.live_sessions -= 1
+    
+    async def score_live(self, session: LiveSession, segments: np.ndarray, settings) -> List[Dict[str, Any]]:
+        """
+        Featurise and score windows completed by a live session, folding them
+        into its accumulator and returning their segment entries. Windows are
+        featurised on the preprocessing threads and scored through the shared
+        micro-batcher, so concurrent sessions share forward passes. Each call
+        waits for an admission slot like any prediction (never shed, since the
+        session is already open), so live traffic counts against
+        max_concurrent_predictions and shows in the queue-time estimate.
+        """
+        if len(segments) == 0:
+            return []
+        
+        async with self.admission.admit(shed=False, record=False):
+            return await self._score_live(session, segments, settings)
+    
+    async def _score_live(self, session: LiveSession, segments: np.ndarray, settings) -> List[Dict[str, Any]]:
+        vad = self._chunk_kwargs(settings)["vad"]
+        # Pool-backed sessions still featurise in-process; these windows are tiny
+        arena = self.arena
+        chunk = await self.preprocess_stage.run(
+            lambda: self.audio_processor.featurise_segments(
+                segments, session.next_index, settings.sample_rate, settings.n_fft, settings.hop_length,
+                settings.win_length, settings.n_mels, settings.d_shape,
+                vad=vad, drop_non_speech=settings.vad_mode == "drop", arena=arena
+            )
+        )
+        session.next_index += len(segments)
+        try:
+            if len(chunk.features):
+                outputs, _ = await self._infer(chunk.features)
+            else:
+                # Nothing but non-speech in these windows
+                outputs = chunk.features.new_empty((0, len(settings.class_labels)))
+            return await self.preprocess_stage.run(session.accumulator.add, outputs, chunk)
+        finally:
+            if chunk.buffer is not None:
+                arena.release(chunk.buffer)
+    
+    def _release(self, chunk: FeatureChunk) -> None:
+        """Hand a scored chunk's feature buffer back to the worker pool or the arena"""
+        if chunk.buffer is None:
+            return
+        if self.preprocess_pool is not None:
+            self.preprocess_pool.release(chunk.buffer)
+        elif self.arena is not None:
+            self.arena.release(chunk.buffer)
+        chunk.buffer = None
+    
+    async def _infer(self, mel_specs: torch.Tensor):
+        """Score segments on the inference stage, sharing the forward pass with concurrent requests"""
+        if self.batcher is not None:
+            return await self.batcher.submit(mel_specs)
+        return await self.inference_stage.run(self.backend.infer, mel_specs)
     
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
-        return self.model is not None
\ No newline at end of file
+        return self.backend.is_loaded()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Runtime metrics for the inference pipeline"""
+        return {
+            "backend": self.backend.name,
+            "admission": self.admission.stats(),
+            "preprocess": self.preprocess_stage.stats(),
+            "preprocess_pool": self.preprocess_pool.stats() if self.preprocess_pool is not None else None,
+            "inference": self.inference_stage.stats(),
+            "batching": self.batcher.stats() if self.batcher is not None else None,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "arena": self.arena.stats() if self.arena is not None else None,
+            "live_sessions": self.live_sessions
+        }
\ No newline at end of file
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class PipelineStage:
+    """
+    A bounded pipeline stage backed by its own thread pool.
+
+    At most `max_in_flight` jobs are queued or running at once; further
+    submitters wait on the event loop (backpressure) instead of piling work
+    into an unbounded executor queue.
+    """
+
+    def __init__(self, name: str, workers: int = 1, max_in_flight: int = 8):
+        self.name = name
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Metrics
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._busy_time = 0.0
+        self._started_at = time.perf_counter()
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run `fn(*args)` on the stage's threads and await the result"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        # The slot is freed when the job itself finishes, not when the caller stops
+        # waiting: a cancelled caller (e.g. a disconnected client) leaves its job
+        # running on the thread, and that job still counts against max_in_flight
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        try:
+            job = self._executor.submit(self._timed, fn, args)
+        except BaseException:
+            self._release()
+            raise
+        job.add_done_callback(lambda _: self._release_from_thread(loop))
+        return await asyncio.wrap_future(job, loop=loop)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+
+    def _release_from_thread(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The loop has already closed; nothing is left to wait for a slot
+            pass
+
+    def _timed(self, fn: Callable[..., Any], args: tuple) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._busy_time += time.perf_counter() - started
+            self._completed += 1
+
+    def shutdown(self) -> None:
+        """Stop the stage's threads once running jobs finish"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and utilisation counters"""
+        elapsed = time.perf_counter() - self._started_at
+        return {
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "utilisation": self._busy_time / (elapsed * self.workers) if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,101 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of prediction results keyed by content hash.
+
+    Concurrent lookups for a key that is already being computed await that
+    computation (single-flight) instead of starting their own. The computation
+    runs as its own task, so it still completes for the other waiters if the
+    caller that started it goes away.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return result
+
+    def _store(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A copy of the cached result for `key`, or None on a miss"""
+        result = self._lookup(key)
+        if result is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Cache a result computed outside get_or_compute"""
+        self._store(key, copy.deepcopy(result))
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result())
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return a cached result, join an in-flight computation, or start one"""
+        result = self._lookup(key)
+        if result is not None:
+            self._hits += 1
+            return copy.deepcopy(result)
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._coalesced += 1
+        else:
+            self._misses += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._on_done(key, done))
+
+        # Callers get their own copy; routes add fields such as record_id
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss/coalesced counters"""
+        lookups = self._hits + self._misses + self._coalesced
+        return {
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "evictions": self._evictions,
+            "hit_rate": (self._hits + self._coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,143 @@
+"""
+Entry point of the preprocessing worker processes started by
+services.process_pool.PreprocessPool.
+
+Kept free of heavy top-level imports so each worker can cap its BLAS/OpenMP
+threads before NumPy loads.
+"""
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Variables read by the BLAS/OpenMP runtimes when NumPy and torch load
+_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# Shared-memory blocks a worker keeps mapped between requests
+_MAX_MAPPED_BLOCKS = 64
+
+
+def worker_main(
+    conn,
+    processor_kwargs: Dict[str, Any],
+    feature_kwargs: Dict[str, Any],
+    chunk_size: int = 256,
+    threads: int = 1,
+    arena_kwargs: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Serve feature-chunk streams over `conn` until told to stop. The worker
+    builds its AudioProcessor from `processor_kwargs` and warms up by
+    featurising one silent segment with `feature_kwargs`; `arena_kwargs` are
+    the TensorArena limits for its raw-segment buffers.
+
+    Messages are ("open", stream_id, source, kwargs), ("next", stream_id,
+    block_name, feature_shape) and ("close", stream_id); None stops the worker.
+    Every message is answered with (status, payload, busy_seconds,
+    arena_bytes), where status is "ok" or "error", an error's payload is the
+    exception and arena_bytes is what the local arena holds idle.
+    """
+    for variable in _THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+
+    from multiprocessing import shared_memory
+
+    import numpy as np
+    import torch
+
+    from services.audio_processing import AudioProcessor
+    from services.tensor_arena import TensorArena
+
+    torch.set_num_threads(threads)
+    processor = AudioProcessor(**processor_kwargs)
+
+    class BlockArena(TensorArena):
+        """Local arena whose feature buffer is the shared-memory block named by the current request"""
+
+        def __init__(self, buckets, **kwargs):
+            super().__init__(buckets, **kwargs)
+            self.block = None
+            self.feature_shape: Tuple[int, ...] = ()
+
+        def acquire(self, n, row_shape, dtype=np.float32):
+            if self.block is not None and tuple(row_shape) == self.feature_shape:
+                return self.block[:n * int(np.prod(row_shape))].reshape((n,) + self.feature_shape)
+            return super().acquire(n, row_shape, dtype)
+
+        def release(self, buffer):
+            if self.block is None or not np.shares_memory(buffer, self.block):
+                super().release(buffer)
+
+    arena = BlockArena([chunk_size], **(arena_kwargs or {}))
+    streams = {}
+    blocks = {}
+
+    def attach(name: str) -> np.ndarray:
+        """Flat float32 view of a block created by the parent, mapped once and kept while recently used"""
+        if name in blocks:
+            blocks[name] = blocks.pop(name)
+            return blocks[name][1]
+
+        shm = shared_memory.SharedMemory(name=name)
+        blocks[name] = (shm, np.ndarray((shm.size // 4,), dtype=np.float32, buffer=shm.buf))
+        if len(blocks) > _MAX_MAPPED_BLOCKS:
+            # The parent retires blocks it no longer pools; unmap the least recently used
+            old_shm = blocks.pop(next(iter(blocks)))[0]
+            old_shm.close()
+        return blocks[name][1]
+
+    # Import librosa, build the mel kernels and size the scratch buffers before the first request
+    samples = int(feature_kwargs.get("sr", 16000) * feature_kwargs.get("segment_length", 1.0))
+    processor.extract_features(np.zeros(samples, dtype=np.float32), **feature_kwargs)
+    conn.send(("ready", os.getpid(), 0.0, arena.pooled_bytes))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        started = time.perf_counter()
+        try:
+            command, stream_id = message[0], message[1]
+            if command == "open":
+                source, kwargs = message[2], message[3]
+                streams[stream_id] = processor.iter_feature_chunks(source, arena=arena, **kwargs)
+                payload = None
+            elif command == "next":
+                block_name, feature_shape = message[2], tuple(message[3])
+                arena.block = attach(block_name)
+                arena.feature_shape = feature_shape
+                try:
+                    chunk = next(streams[stream_id], None)
+                finally:
+                    arena.block = None
+                if chunk is None:
+                    del streams[stream_id]
+                    payload = None
+                else:
+                    count = len(chunk.features)
+                    features = chunk.features.numpy()
+                    block = attach(block_name)[:features.size].reshape(features.shape)
+                    if not np.shares_memory(features, block):
+                        block[...] = features
+                    payload = (count, chunk.segment_index, chunk.speech, chunk.skipped)
+            elif command == "close":
+                stream = streams.pop(stream_id, None)
+                if stream is not None:
+                    stream.close()
+                payload = None
+            else:
+                raise ValueError(f"Unknown command: {command}")
+            reply = ("ok", payload)
+        except Exception as e:
+            # A generator that raised is finished; drop it with its stream
+            streams.pop(message[1], None)
+            reply = ("error", e)
+
+        try:
+            conn.send(reply + (time.perf_counter() - started, arena.pooled_bytes))
+        except Exception as e:
+            # An unpicklable exception still has to reach the parent
+            conn.send(("error", RuntimeError(str(e)), time.perf_counter() - started, arena.pooled_bytes))
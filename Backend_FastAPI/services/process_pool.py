@@ -0,0 +1,339 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from services.audio_processing import AudioSource, FeatureChunk
+from services.preprocess_worker import worker_main
+
+
+@dataclass
+class _Worker:
+    """One preprocessing process and the thread that talks to it"""
+    index: int
+    process: Any
+    conn: Any
+    executor: ThreadPoolExecutor
+    streams: int = 0
+    busy_time: float = 0.0
+    completed: int = 0
+    restarts: int = 0
+    # Idle arena bytes the process reported with its last reply
+    arena_bytes: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class _Stream:
+    """A recording being featurised by one worker"""
+    id: int
+    worker: _Worker
+    feature_shape: Tuple[int, ...]
+    block_size: int
+    done: bool = False
+
+
+class _SharedBlock:
+    """Shared-memory segment holding one chunk of features, created and unlinked by the parent"""
+
+    def __init__(self, size: int):
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray((size // 4,), dtype=np.float32, buffer=self.shm.buf)
+
+    def destroy(self) -> None:
+        self.array = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Tensors still view it; the mapping goes when they do
+            pass
+        self.shm.unlink()
+
+
+class PreprocessPool:
+    """
+    Dedicated, bounded process pool for decoding and featurisation.
+
+    Workers are spawned once, import librosa/NumPy and warm the feature
+    engine before serving. A recording is featurised as a stream of chunks
+    on one worker: each `next` call lends the worker a shared-memory block,
+    the worker writes the chunk's features straight into it, and only the
+    small per-segment metadata is pickled back. The returned tensor views
+    the block until `release` hands it back to the pool.
+
+    At most `max_in_flight` calls are queued or running at once across the
+    pool; further callers wait on the event loop. Up to two idle blocks per
+    in-flight call are kept for reuse.
+
+    Workers use the "spawn" start method (forking after torch has started its
+    thread pools can deadlock), so scripts that start a pool need an
+    `if __name__ == "__main__":` guard.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        max_in_flight: int = 8,
+        processor_kwargs: Optional[Dict[str, Any]] = None,
+        feature_kwargs: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 256,
+        threads_per_process: int = 1,
+        arena_kwargs: Optional[Dict[str, Any]] = None
+    ):
+        self.processes = processes
+        self.max_in_flight = max_in_flight
+        # AudioProcessor arguments, and the default feature settings workers warm up with
+        self.processor_kwargs = processor_kwargs or {}
+        self.feature_kwargs = feature_kwargs or {}
+        self.chunk_size = chunk_size
+        self.threads_per_process = threads_per_process
+        # TensorArena limits for the workers' raw-segment buffers
+        self.arena_kwargs = arena_kwargs or {}
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._stream_ids = itertools.count()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self._idle_blocks: Dict[int, List[_SharedBlock]] = {}
+        self._blocks_in_use: Dict[int, _SharedBlock] = {}
+        self._block_lock = threading.Lock()
+
+        # Metrics
+        self._in_flight = 0
+        self._waiting = 0
+        self._blocks_created = 0
+
+    def start(self) -> None:
+        """Spawn the workers and wait until every one has warmed up (blocking)"""
+        for index in range(self.processes):
+            self._workers.append(self._spawn(index))
+
+    def _spawn(self, index: int) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=worker_main,
+            args=(
+                child_conn, self.processor_kwargs, self.feature_kwargs,
+                self.chunk_size, self.threads_per_process, self.arena_kwargs
+            ),
+            name=f"preprocess-{index}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        status, _, _, _ = parent_conn.recv()
+        if status != "ready":
+            raise RuntimeError(f"Preprocessing worker {index} failed to start")
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"preprocess-{index}")
+        return _Worker(index, process, parent_conn, executor)
+
+    def shutdown(self) -> None:
+        """Stop the workers and unlink every shared-memory block"""
+        for worker in self._workers:
+            worker.executor.shutdown(wait=True, cancel_futures=True)
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        self._workers = []
+
+        with self._block_lock:
+            blocks = [block for idle in self._idle_blocks.values() for block in idle]
+            blocks.extend(self._blocks_in_use.values())
+            self._idle_blocks.clear()
+            self._blocks_in_use.clear()
+        for block in blocks:
+            block.destroy()
+
+    def _roundtrip(self, worker: _Worker, message: tuple) -> Any:
+        """Send one message to a worker and wait for its reply (on the worker's thread)"""
+        try:
+            worker.conn.send(message)
+            status, payload, busy, worker.arena_bytes = worker.conn.recv()
+        except (EOFError, OSError):
+            # The process died; replace it so later streams can still be served
+            self._restart(worker)
+            raise RuntimeError("Preprocessing worker exited unexpectedly")
+
+        worker.busy_time += busy
+        worker.completed += 1
+        if status == "error":
+            raise payload
+        return payload
+
+    def _restart(self, worker: _Worker) -> None:
+        worker.conn.close()
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(timeout=5)
+
+        replacement = self._spawn(worker.index)
+        replacement.executor.shutdown(wait=False)
+        worker.process = replacement.process
+        worker.conn = replacement.conn
+        worker.streams = 0
+        worker.restarts += 1
+
+    async def _call(self, worker: _Worker, message: tuple) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(worker.executor, self._roundtrip, worker, message)
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def open(self, source: AudioSource, **kwargs) -> _Stream:
+        """
+        Start featurising `source` on the least busy worker. `kwargs` are the
+        AudioProcessor.iter_feature_chunks arguments after the source.
+        """
+        if not self._workers:
+            raise RuntimeError("Preprocessing pool not started")
+
+        # File objects cannot cross the process boundary: files with a path (such as
+        # spilled upload spools) are reopened by the worker, the rest are sent as bytes
+        if hasattr(source, "read"):
+            name = getattr(source, "name", None)
+            if isinstance(name, str) and os.path.isfile(name):
+                source = name
+            else:
+                source = source.read()
+        elif isinstance(source, (bytearray, memoryview)):
+            source = bytes(source)
+
+        d_shape = kwargs.get("d_shape", 64)
+        worker = min(self._workers, key=lambda candidate: (candidate.streams, candidate.busy_time))
+        stream = _Stream(
+            next(self._stream_ids),
+            worker,
+            (1, d_shape, d_shape),
+            kwargs.get("chunk_size", 256) * d_shape * d_shape * 4
+        )
+        worker.streams += 1
+        try:
+            await self._call(worker, ("open", stream.id, source, kwargs))
+        except Exception:
+            self._finish(stream)
+            raise
+        return stream
+
+    async def next(self, stream: _Stream) -> Optional[FeatureChunk]:
+        """The stream's next chunk, or None once the recording is exhausted"""
+        if stream.done:
+            return None
+
+        block = self._acquire_block(stream.block_size)
+        try:
+            payload = await self._call(stream.worker, ("next", stream.id, block.shm.name, stream.feature_shape))
+        except BaseException:
+            # A cancelled call may still be writing the block, so it is not reused
+            self._forget_block(block)
+            self._finish(stream)
+            raise
+
+        if payload is None:
+            self._release_block(block)
+            self._finish(stream)
+            return None
+
+        count, segment_index, speech, skipped = payload
+        features = block.array[:count * int(np.prod(stream.feature_shape))].reshape((count,) + stream.feature_shape)
+        return FeatureChunk(torch.from_numpy(features), segment_index, speech, skipped, block.array)
+
+    async def close(self, stream: _Stream) -> None:
+        """Stop a stream before it is exhausted"""
+        if stream.done:
+            return
+        self._finish(stream)
+        await self._call(stream.worker, ("close", stream.id))
+
+    def _finish(self, stream: _Stream) -> None:
+        if not stream.done:
+            stream.done = True
+            stream.worker.streams = max(stream.worker.streams - 1, 0)
+
+    def release(self, buffer: np.ndarray) -> None:
+        """Return the block behind a chunk's `buffer` once its features have been used"""
+        with self._block_lock:
+            block = self._blocks_in_use.get(id(buffer))
+        if block is not None:
+            self._release_block(block)
+
+    def _acquire_block(self, size: int) -> _SharedBlock:
+        with self._block_lock:
+            idle = self._idle_blocks.get(size)
+            block = idle.pop() if idle else None
+        if block is None:
+            block = _SharedBlock(size)
+            self._blocks_created += 1
+        with self._block_lock:
+            self._blocks_in_use[id(block.array)] = block
+        return block
+
+    def _release_block(self, block: _SharedBlock) -> None:
+        with self._block_lock:
+            self._blocks_in_use.pop(id(block.array), None)
+            idle = self._idle_blocks.setdefault(block.shm.size, [])
+            if len(idle) < 2 * self.max_in_flight:
+                idle.append(block)
+                return
+        block.destroy()
+
+    def _forget_block(self, block: _SharedBlock) -> None:
+        with self._block_lock:
+            self._blocks_in_use.pop(id(block.array), None)
+        block.destroy()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, queue depth and per-worker utilisation"""
+        now = time.perf_counter()
+        with self._block_lock:
+            idle_blocks = sum(len(idle) for idle in self._idle_blocks.values())
+            blocks_in_use = len(self._blocks_in_use)
+        return {
+            "processes": self.processes,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "shared_blocks": {
+                "in_use": blocks_in_use,
+                "idle": idle_blocks,
+                "created": self._blocks_created,
+            },
+            "workers": [
+                {
+                    "pid": worker.process.pid,
+                    "alive": worker.process.is_alive(),
+                    "streams": worker.streams,
+                    "completed": worker.completed,
+                    "restarts": worker.restarts,
+                    "arena_bytes": worker.arena_bytes,
+                    "utilisation": worker.busy_time / (now - worker.started_at) if now > worker.started_at else 0.0,
+                }
+                for worker in self._workers
+            ],
+        }
@@ -0,0 +1,63 @@
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+import soxr
+
+# resample(block, last) -> resampled block; `last=True` flushes the filter tail
+ResampleFn = Callable[..., np.ndarray]
+
+# Idle soxr streams kept per rate pair
+_SOXR_POOL_SIZE = 8
+
+
+class Resampler(ABC):
+    """Streaming sample-rate converter used while decoding"""
+
+    name = "base"
+
+    @abstractmethod
+    @contextmanager
+    def stream(self, in_rate: int, out_rate: int) -> Iterator[ResampleFn]:
+        """Stateful resampling function for one recording"""
+
+
+class SoxrResampler(Resampler):
+    """
+    libsoxr, as used by librosa.load (quality "HQ" reproduces it exactly).
+    Streams are reset and pooled per rate pair, so the filter is designed
+    once per pair rather than once per upload.
+    """
+
+    name = "soxr"
+
+    def __init__(self, quality: str = "HQ"):
+        self.quality = quality
+        self._idle: Dict[Tuple[int, int], List[soxr.ResampleStream]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stream(self, in_rate: int, out_rate: int) -> Iterator[ResampleFn]:
+        key = (in_rate, out_rate)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            resampler = idle.pop() if idle else None
+        if resampler is None:
+            resampler = soxr.ResampleStream(in_rate, out_rate, 1, dtype="float32", quality=self.quality)
+
+        try:
+            yield resampler.resample_chunk
+        finally:
+            resampler.clear()
+            with self._lock:
+                if len(self._idle[key]) < _SOXR_POOL_SIZE:
+                    self._idle[key].append(resampler)
+
+
+def create_resampler(kind: str = "soxr", quality: str = "HQ") -> Resampler:
+    """Build the resampler selected by settings.resampler"""
+    if kind == "soxr":
+        return SoxrResampler(quality)
+    raise ValueError(f"Unknown resampler: {kind}")
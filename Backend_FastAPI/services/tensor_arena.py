@@ -0,0 +1,108 @@
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# (bucket rows, row shape, dtype) identifying interchangeable buffers
+_PoolKey = Tuple[int, Tuple[int, ...], str]
+
+
+class TensorArena:
+    """
+    Pool of preallocated numpy buffers reused across requests.
+
+    Buffers are sized by segment-count bucket: `acquire(n, row_shape)` hands out
+    a (bucket, *row_shape) array for the smallest bucket holding `n` rows, and
+    callers work in its first `n` rows. Feature extraction writes model input
+    straight into these buffers and `torch.from_numpy` shares their memory, so
+    in steady state a prediction allocates no large arrays. Requests larger than
+    the biggest bucket get a plain, unpooled array.
+
+    Idle buffers are kept up to `max_buffers_per_bucket` per shape and
+    `max_bytes` in total; a buffer released beyond either limit is dropped.
+    """
+
+    def __init__(
+        self,
+        buckets: Iterable[int],
+        max_buffers_per_bucket: int = 2,
+        max_bytes: Optional[int] = None
+    ):
+        self.buckets = sorted({int(size) for size in buckets if int(size) > 0})
+        self.max_buffers_per_bucket = max_buffers_per_bucket
+        self.max_bytes = max_bytes
+        self._idle: Dict[_PoolKey, List[np.ndarray]] = {}
+        self._pooled_bytes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._oversize = 0
+        self._in_use = 0
+
+    def bucket_size(self, n: int) -> int:
+        """Rows of the buffer `acquire(n)` returns"""
+        position = bisect.bisect_left(self.buckets, n)
+        return self.buckets[position] if position < len(self.buckets) else n
+
+    def acquire(self, n: int, row_shape: Tuple[int, ...], dtype=np.float32) -> np.ndarray:
+        """A buffer of at least `n` rows of `row_shape`; contents are undefined"""
+        rows = self.bucket_size(n)
+        key = (rows, tuple(row_shape), np.dtype(dtype).str)
+
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._hits += 1
+                self._in_use += 1
+                buffer = idle.pop()
+                self._pooled_bytes -= buffer.nbytes
+                return buffer
+            if rows in self.buckets:
+                self._misses += 1
+                self._in_use += 1
+            else:
+                self._oversize += 1
+
+        return np.empty((rows,) + tuple(row_shape), dtype=dtype)
+
+    def release(self, buffer: np.ndarray) -> None:
+        """Return a buffer from `acquire` to the pool; it must no longer be read or written"""
+        rows = buffer.shape[0]
+        if rows not in self.buckets:
+            return
+
+        key = (rows, buffer.shape[1:], buffer.dtype.str)
+        with self._lock:
+            self._in_use -= 1
+            idle = self._idle.setdefault(key, [])
+            if len(idle) >= self.max_buffers_per_bucket:
+                return
+            if self.max_bytes is not None and self._pooled_bytes + buffer.nbytes > self.max_bytes:
+                return
+            idle.append(buffer)
+            self._pooled_bytes += buffer.nbytes
+
+    @property
+    def pooled_bytes(self) -> int:
+        """Bytes held by idle buffers"""
+        return self._pooled_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool sizes and hit counters"""
+        with self._lock:
+            pooled = sum(len(idle) for idle in self._idle.values())
+            return {
+                "buckets": self.buckets,
+                "max_buffers_per_bucket": self.max_buffers_per_bucket,
+                "max_bytes": self.max_bytes,
+                "pooled_buffers": pooled,
+                "pooled_bytes": self._pooled_bytes,
+                "in_use": self._in_use,
+                "hits": self._hits,
+                "misses": self._misses,
+                "oversize": self._oversize,
+                "hit_rate": self._hits / (self._hits + self._misses) if self._hits + self._misses else 0.0,
+            }
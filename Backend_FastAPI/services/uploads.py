@@ -0,0 +1,231 @@
+import hashlib
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Sequence
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    # python-multipart < 0.0.13 only ships the `multipart` package
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Allowance for multipart boundaries and part headers on top of the file itself
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeds the configured size limit"""
+
+
+class InvalidUploadError(ValueError):
+    """The request body is not a usable audio upload"""
+
+
+@dataclass
+class AudioUpload:
+    """An audio file received from a multipart request"""
+    filename: str
+    # A BytesIO up to the spool size, then a named temporary file in the spool
+    # directory (which the decoder memory-maps); positioned at the start
+    file: BinaryIO
+    size: int
+    # SHA-256 of the file's bytes, computed as they arrived
+    digest: "hashlib._Hash"
+
+
+class _FilePartReceiver:
+    """python-multipart callbacks that stream the files of one field into spools"""
+
+    def __init__(
+        self,
+        field_name: str,
+        max_size: int,
+        allowed_extensions: Sequence[str],
+        spool_size: int,
+        spool_dir: Optional[str],
+        max_files: int = 1
+    ):
+        self.field_name = field_name
+        self.max_size = max_size
+        self.allowed_extensions = tuple(extension.lower() for extension in allowed_extensions)
+        self.spool_size = spool_size
+        self.spool_dir = spool_dir
+        self.max_files = max_files
+        self.uploads: List[AudioUpload] = []
+
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._receiving = False
+
+    def callbacks(self) -> Dict[str, object]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        if name == self.field_name and len(self.uploads) >= self.max_files and self.max_files > 1:
+            raise InvalidUploadError(f"Too many files. Max files: {self.max_files}")
+        if name != self.field_name or len(self.uploads) >= self.max_files:
+            # Other form fields (and repeats of a single-file field) are skipped without being stored
+            self._receiving = False
+            return
+
+        if b"filename" not in options:
+            raise InvalidUploadError(f"Field '{self.field_name}' must be a file")
+        filename = os.path.basename(options[b"filename"].decode("utf-8", errors="replace"))
+
+        # Reject the wrong file type before any of its data is received
+        if not filename.lower().endswith(self.allowed_extensions):
+            raise InvalidUploadError(f"Invalid file type. Allowed: {list(self.allowed_extensions)}")
+
+        self.uploads.append(AudioUpload(filename, io.BytesIO(), 0, hashlib.sha256()))
+        self._receiving = True
+
+    def _roll_over(self, buffer: io.BytesIO) -> BinaryIO:
+        """Move an in-memory spool to a named file, so it can be mapped or opened by path"""
+        spool = tempfile.NamedTemporaryFile(dir=self.spool_dir)
+        spool.write(buffer.getbuffer())
+        return spool
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._receiving:
+            return
+        upload = self.uploads[-1]
+        chunk = data[start:end]
+        upload.size += len(chunk)
+        if upload.size > self.max_size:
+            raise UploadTooLargeError(f"File too large. Max size: {self.max_size} bytes")
+        upload.digest.update(chunk)
+        if upload.size > self.spool_size and isinstance(upload.file, io.BytesIO):
+            upload.file = self._roll_over(upload.file)
+        upload.file.write(chunk)
+
+    def on_part_end(self) -> None:
+        self._receiving = False
+
+
+async def receive_audio_upload(
+    headers,
+    body: AsyncIterator[bytes],
+    field_name: str = "audio",
+    max_size: int = 16 * 1024 * 1024,
+    allowed_extensions: Sequence[str] = (".wav", ".mp3", ".ogg"),
+    spool_size: int = 1024 * 1024,
+    spool_dir: Optional[str] = None
+) -> AudioUpload:
+    """
+    Stream a multipart/form-data body and extract the file in `field_name`.
+
+    The body is consumed chunk by chunk. Each chunk of the file is hashed and
+    written to a spool that stays in memory up to `spool_size` bytes and then
+    moves to a named file in `spool_dir` (tmpfs in the default settings). The
+    decoder memory-maps that file rather than reading it back, so the heap
+    used per request does not grow with upload size.
+    A declared Content-Length over the limit is rejected before reading, and
+    the running byte count aborts the transfer as soon as `max_size` is passed.
+    """
+    uploads = await receive_audio_uploads(
+        headers,
+        body,
+        field_name=field_name,
+        max_size=max_size,
+        max_files=1,
+        allowed_extensions=allowed_extensions,
+        spool_size=spool_size,
+        spool_dir=spool_dir
+    )
+    return uploads[0]
+
+
+async def receive_audio_uploads(
+    headers,
+    body: AsyncIterator[bytes],
+    field_name: str = "audio",
+    max_size: int = 16 * 1024 * 1024,
+    max_files: int = 16,
+    max_total_size: Optional[int] = None,
+    allowed_extensions: Sequence[str] = (".wav", ".mp3", ".ogg"),
+    spool_size: int = 1024 * 1024,
+    spool_dir: Optional[str] = None
+) -> List[AudioUpload]:
+    """
+    Stream a multipart/form-data body carrying up to `max_files` files in
+    `field_name`, as receive_audio_upload does for one. Each file is limited
+    to `max_size` bytes and the body as a whole to `max_total_size` (default
+    max_size * max_files).
+    """
+    content_type, options = parse_options_header(headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise InvalidUploadError("Expected a multipart/form-data upload")
+
+    if max_total_size is None:
+        max_total_size = max_size * max_files
+    body_limit = max_total_size + _MULTIPART_OVERHEAD * max_files
+    too_large = f"File too large. Max size: {max_size} bytes" if max_files == 1 else \
+        f"Upload too large. Max total size: {max_total_size} bytes"
+
+    declared = headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > body_limit:
+        raise UploadTooLargeError(too_large)
+
+    receiver = _FilePartReceiver(field_name, max_size, allowed_extensions, spool_size, spool_dir, max_files)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+
+    def close_all() -> None:
+        for upload in receiver.uploads:
+            upload.file.close()
+
+    received = 0
+    try:
+        async for chunk in body:
+            received += len(chunk)
+            if received > body_limit:
+                raise UploadTooLargeError(too_large)
+            parser.write(chunk)
+        parser.finalize()
+    except (UploadTooLargeError, InvalidUploadError):
+        close_all()
+        raise
+    except Exception as e:
+        close_all()
+        raise InvalidUploadError(f"Malformed multipart body: {e}")
+
+    if not receiver.uploads:
+        raise InvalidUploadError(f"Missing file field '{field_name}'")
+    if sum(upload.size for upload in receiver.uploads) > max_total_size:
+        close_all()
+        raise UploadTooLargeError(too_large)
+    for upload in receiver.uploads:
+        if upload.size == 0:
+            close_all()
+            name = "Uploaded file" if max_files == 1 else f"Uploaded file '{upload.filename}'"
+            raise InvalidUploadError(f"{name} is empty")
+
+    for upload in receiver.uploads:
+        upload.file.seek(0)
+    return receiver.uploads
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class EnergyVAD:
+    """
+    Cheap energy + zero-crossing voice-activity detector for whole segments.
+
+    Each segment is split into short frames; a frame counts as speech when its
+    RMS level reaches `energy_threshold_db` (dBFS) and its zero-crossing rate
+    stays at or below `max_zcr` (broadband hiss crosses zero far more often
+    than voiced speech). A segment is speech when at least
+    `min_speech_fraction` of its frames are.
+    """
+
+    def __init__(
+        self,
+        sr: int = 16000,
+        energy_threshold_db: float = -45.0,
+        max_zcr: float = 0.35,
+        min_speech_fraction: float = 0.1,
+        frame_length: float = 0.025
+    ):
+        self.sr = sr
+        self.energy_threshold_db = energy_threshold_db
+        self.max_zcr = max_zcr
+        self.min_speech_fraction = min_speech_fraction
+        self.frame_samples = max(int(frame_length * sr), 1)
+
+    def __call__(self, segments: np.ndarray) -> np.ndarray:
+        """Boolean speech mask for a (num_segments, samples) matrix"""
+        num_segments, num_samples = segments.shape
+        if num_segments == 0 or num_samples == 0:
+            return np.zeros(num_segments, dtype=bool)
+
+        frame = min(self.frame_samples, num_samples)
+        num_frames = num_samples // frame
+        frames = segments[:, :num_frames * frame].reshape(num_segments, num_frames, frame)
+
+        energy = np.mean(np.square(frames, dtype=np.float32), axis=-1)
+        level_db = 10.0 * np.log10(energy + 1e-12)
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[..., 1:] != signs[..., :-1], axis=-1) / max(frame - 1, 1)
+
+        speech_frames = (level_db >= self.energy_threshold_db) & (zcr <= self.max_zcr)
+        return speech_frames.mean(axis=1) >= self.min_speech_fraction
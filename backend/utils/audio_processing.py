@@ -1,8 +1,17 @@
 import numpy as np
 import librosa
+import soundfile as sf
+import soxr
 import torch
 import cv2
 import os
+from functools import lru_cache
+
+# Segments resized per cv2.resize call (stacked as channels of one image)
+MAX_RESIZE_CHANNELS = 128
+
+# Segments per STFT block
+STFT_BLOCK_SIZE = 64
 
 def load_audio(file_path, sr=16000):
     """
@@ -11,6 +20,61 @@ def load_audio(file_path, sr=16000):
     y, _ = librosa.load(file_path, sr=sr)
     return y
 
+def iter_decoded(file_path, sr=16000, block_seconds=1.0):
+    """
+    Decode and resample an audio file incrementally, yielding mono float32 blocks.
+    Concatenated, the blocks equal load_audio(file_path, sr)
+    """
+    try:
+        audio_file = sf.SoundFile(file_path)
+    except sf.SoundFileRuntimeError:
+        # Formats libsndfile cannot read go through librosa's fallback decoders
+        yield load_audio(file_path, sr=sr)
+        return
+    
+    with audio_file:
+        native_sr = audio_file.samplerate
+        resampler = None
+        target_length = audio_file.frames
+        if native_sr != sr:
+            resampler = soxr.ResampleStream(native_sr, sr, 1, dtype='float32', quality='HQ')
+            target_length = int(np.ceil(audio_file.frames * float(sr) / native_sr))
+        
+        emitted = 0
+        blocksize = max(int(native_sr * block_seconds), 1)
+        for block in audio_file.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+            mono = block.mean(axis=1)
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono, last=False)
+            mono = mono[:target_length - emitted]
+            emitted += len(mono)
+            if len(mono):
+                yield mono
+        
+        if resampler is not None:
+            rest = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            rest = rest[:target_length - emitted]
+            emitted += len(rest)
+            if len(rest):
+                yield rest
+        if emitted < target_length:
+            yield np.zeros(target_length - emitted, dtype=np.float32)
+
+def iter_segments(file_path, sr=16000, segment_length=1.0):
+    """
+    Yield fixed-length segments while the file is still being decoded,
+    keeping only a carry-over buffer shorter than one segment
+    """
+    samples_per_segment = int(segment_length * sr)
+    carry = np.empty(0, dtype=np.float32)
+    
+    for block in iter_decoded(file_path, sr=sr):
+        carry = np.concatenate([carry, block])
+        num_segments = len(carry) // samples_per_segment
+        for i in range(num_segments):
+            yield carry[i * samples_per_segment:(i + 1) * samples_per_segment]
+        carry = carry[num_segments * samples_per_segment:]
+
 def segment_audio(y, segment_length=1.0, sr=16000):
     """
     Segment audio into fixed-length segments
@@ -49,28 +113,82 @@ def audio_to_melspectrogram(clip, sr=16000, n_fft=1024, hop_length=256, win_leng
     log_spectrogram = librosa.amplitude_to_db(mel_spec)
     
     # Normalize
-    norm = (log_spectrogram - np.min(log_spectrogram)) / (np.max(log_spectrogram) - np.min(log_spectrogram))
+    value_range = np.max(log_spectrogram) - np.min(log_spectrogram)
+    # A constant spectrogram (digital silence) normalises to zeros rather than NaN
+    norm = (log_spectrogram - np.min(log_spectrogram)) / (value_range if value_range > 0 else 1.0)
     
     # Resize to target shape
     img = cv2.resize(norm, dsize=(d_shape, d_shape), interpolation=cv2.INTER_CUBIC)
     
     return img
 
-def preprocess_audio(file_path, sr=16000, n_fft=1024, hop_length=256, win_length=1024, n_mels=64, d_shape=64):
+@lru_cache(maxsize=16)
+def get_mel_kernels(sr, n_fft, n_mels, win_length):
     """
-    Preprocess audio file for model input, following your specific approach
+    Return the cached Hann window and mel filterbank for a parameter set
+    """
+    window = librosa.filters.get_window('hann', win_length, fftbins=True)
+    window = librosa.util.pad_center(window, size=n_fft).astype(np.float32)
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    window.setflags(write=False)
+    mel_basis.setflags(write=False)
+    return window, mel_basis
+
+def melspectrogram_batch(segments, sr=16000, n_fft=1024, hop_length=256, win_length=1024, n_mels=64, d_shape=64):
+    """
+    Vectorized audio_to_melspectrogram over a (num_segments, samples) matrix.
+    Returns (num_segments, d_shape, d_shape), equal to the per-segment version within 1e-4
     """
-    # Load audio
-    y = load_audio(file_path, sr=sr)
+    segments = np.asarray(segments, dtype=np.float32)
+    num_segments, num_samples = segments.shape
+    num_frames = 1 + num_samples // hop_length
+    window, mel_basis = get_mel_kernels(sr, n_fft, n_mels, win_length)
+    
+    # Centered, zero-padded STFT frames (librosa.stft defaults), in blocks to bound memory
+    pad = n_fft // 2
+    mel_spec = np.empty((num_segments, n_mels, num_frames), dtype=np.float32)
+    for start in range(0, num_segments, STFT_BLOCK_SIZE):
+        padded = np.pad(segments[start:start + STFT_BLOCK_SIZE], ((0, 0), (pad, pad)))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft, axis=-1)[:, ::hop_length][:, :num_frames]
+        spectrum = np.fft.rfft(frames * window, axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        mel_spec[start:start + len(padded)] = np.matmul(mel_basis, power.transpose(0, 2, 1))
+    
+    # Convert to dB scale per segment (amplitude_to_db with top_db=80)
+    log_spectrogram = 20.0 * np.log10(np.maximum(mel_spec, 1e-5))
+    seg_max = log_spectrogram.max(axis=(1, 2), keepdims=True)
+    log_spectrogram = np.maximum(log_spectrogram, seg_max - 80.0)
+    
+    # Normalize per segment
+    seg_min = log_spectrogram.min(axis=(1, 2), keepdims=True)
+    seg_max = log_spectrogram.max(axis=(1, 2), keepdims=True)
+    value_range = seg_max - seg_min
+    value_range[value_range == 0] = 1.0
+    norm = (log_spectrogram - seg_min) / value_range
     
-    # Segment audio
-    segments = segment_audio(y, sr=sr)
+    # Resize to target shape, segments stacked as image channels
+    images = np.empty((num_segments, d_shape, d_shape), dtype=np.float32)
+    for start in range(0, num_segments, MAX_RESIZE_CHANNELS):
+        group = np.ascontiguousarray(norm[start:start + MAX_RESIZE_CHANNELS].transpose(1, 2, 0))
+        resized = cv2.resize(group, dsize=(d_shape, d_shape), interpolation=cv2.INTER_CUBIC)
+        images[start:start + group.shape[-1]] = resized.reshape(d_shape, d_shape, -1).transpose(2, 0, 1)
     
-    # Convert each segment to mel-spectrogram
-    mel_specs = []
-    for segment in segments:
-        mel_spec = audio_to_melspectrogram(
-            segment, 
+    return images
+
+def preprocess_audio(file_path, sr=16000, n_fft=1024, hop_length=256, win_length=1024, n_mels=64, d_shape=64, segment_length=1.0):
+    """
+    Preprocess audio file for model input, following your specific approach
+    """
+    # Decode, segment and featurise incrementally, STFT_BLOCK_SIZE segments at a time,
+    # so neither the full waveform nor all of its segments are ever held at once
+    samples_per_segment = int(segment_length * sr)
+    batch = np.empty((STFT_BLOCK_SIZE, samples_per_segment), dtype=np.float32)
+    count = 0
+    chunks = []
+    
+    def featurise(segments):
+        return melspectrogram_batch(
+            segments, 
             sr=sr, 
             n_fft=n_fft, 
             hop_length=hop_length, 
@@ -78,15 +196,23 @@ def preprocess_audio(file_path, sr=16000, n_fft=1024, hop_length=256, win_length
             n_mels=n_mels, 
             d_shape=d_shape
         )
-        mel_specs.append(mel_spec)
     
-    # Convert to numpy array
-    mel_specs = np.array(mel_specs)
+    for segment in iter_segments(file_path, sr=sr, segment_length=segment_length):
+        batch[count] = segment
+        count += 1
+        if count == STFT_BLOCK_SIZE:
+            chunks.append(featurise(batch))
+            count = 0
+    if count or not chunks:
+        chunks.append(featurise(batch[:count]))
+    
+    # The (d_shape x d_shape) images are far smaller than the segments they come from
+    mel_specs = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
     
     # Prepare for PyTorch model (add channel dimension)
     # Shape: (batch_size, 1, d_shape, d_shape)
     mel_specs = np.expand_dims(mel_specs, axis=1)
-    mel_specs = torch.FloatTensor(mel_specs)
+    mel_specs = torch.from_numpy(mel_specs)
     
     return mel_specs
 